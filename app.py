@@ -1,7 +1,11 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import base64
+import time
+import uuid
 from generator import HTMLGenerator
+from history import HistoryStore
+import delivery
+import profiling
 
 # Configure page
 st.set_page_config(
@@ -17,6 +21,41 @@ def load_generator():
 
 generator = load_generator()
 
+# Past generations of all sessions, shared by the whole process
+@st.cache_resource
+def load_history():
+    return HistoryStore()
+
+history = load_history()
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Source view and download run as fragments: their own widgets rerun only them, not the whole page
+@st.fragment
+def show_source(html_code):
+    # Large pages are only shipped in full when asked for
+    source, truncated = delivery.code_preview(html_code)
+    if truncated and st.toggle(f"Show full source ({len(html_code) // 1024} KB)", key='show_full_source'):
+        source = html_code
+    st.code(source, language='html')
+    if truncated and source is not html_code:
+        st.caption("Source truncated - download the file for the complete page.")
+
+@st.fragment
+def show_download(html_code):
+    # The artifact is built once per page, not on every rerun
+    opt1, opt2 = st.columns(2)
+    minify = opt1.checkbox("Minify HTML/CSS/JS", key='download_minify')
+    compress = opt2.checkbox("Gzip download", key='download_gzip')
+    artifact = delivery.prepare_artifact(html_code, minify=minify, compress=compress)
+    st.download_button(
+        f"📥 Download HTML File ({artifact.size / 1024:.1f} KB)",
+        data=artifact.data,
+        file_name=artifact.file_name,
+        mime=artifact.mime,
+        use_container_width=True
+    )
+
 # Display model status
 if hasattr(generator, 'model_name'):
     if generator.model_name == "dialogpt-small":
@@ -25,12 +64,59 @@ if hasattr(generator, 'model_name'):
         st.info("⚡ Using DistilGPT2 - Fast and efficient AI generation")
     elif generator.model_name == "gpt2":
         st.info("🔄 Using GPT2 Base - Reliable AI text generation")
+    elif generator.model_name == "gpt2-speculative":
+        st.success("⚡ Using GPT2 with DistilGPT2 speculative decoding")
     elif generator.use_openai:
         st.success("🤖 OpenAI API available for generation")
     else:
         st.info("📋 Using smart template-based generation")
         st.info("💡 Templates provide instant, reliable results optimized for web apps!")
 
+# Memory use of this app instance
+if hasattr(generator, 'memory'):
+    with st.sidebar.expander("🧠 Memory", expanded=False):
+        memory_stats = generator.memory.stats()
+        st.metric("Process RSS", f"{memory_stats['rss_mb']} MB",
+                  help=f"Budget: {memory_stats['budget_mb'] or 'unlimited'} MB")
+        st.caption(
+            f"Model loaded: {'yes' if memory_stats['model_loaded'] else 'no'} · "
+            f"idle {memory_stats['idle_seconds']}s · "
+            f"unloads {memory_stats['unloads']} · reloads {memory_stats['reloads']}"
+        )
+
+# Torch threads used by this worker
+if getattr(generator, 'thread_tuning', None):
+    with st.sidebar.expander("⚙️ CPU Threads", expanded=False):
+        tuning = generator.thread_tuning
+        st.metric("Threads per worker", tuning['threads'],
+                  help=f"{tuning['cores']} cores shared by {tuning['workers']} worker(s)")
+        st.caption(
+            f"Source: {tuning['source']}"
+            + (f" · {tuning['tokens_per_sec']} tokens/s" if tuning.get('tokens_per_sec') else "")
+        )
+
+# Speculative decoding performance
+if hasattr(generator.generator, 'stats'):
+    with st.sidebar.expander("⚡ Speculative Decoding", expanded=False):
+        decoding_stats = generator.generator.stats()
+        st.metric("Throughput", f"{decoding_stats['tokens_per_sec'] or '-'} tokens/s")
+        st.caption(
+            f"Draft acceptance: {decoding_stats['acceptance_rate'] if decoding_stats['acceptance_rate'] is not None else '-'} · "
+            f"generations: {decoding_stats['generations']}"
+        )
+
+# Prompts served straight from templates
+if hasattr(generator, 'router'):
+    with st.sidebar.expander("🧭 Template Router", expanded=False):
+        router_stats = generator.router.stats()
+        st.metric("Model time saved", f"{router_stats['estimated_seconds_saved']}s",
+                  help=f"Confidence threshold: {router_stats['threshold']}")
+        st.caption(
+            f"Routed to templates: {router_stats['routed']} · "
+            f"model calls: {router_stats['model_calls']} "
+            f"(avg {router_stats['avg_model_seconds']}s)"
+        )
+
 # Main app interface
 st.title("🎨 AI HTML Generator")
 st.markdown("Generate beautiful HTML web apps from simple English descriptions using AI")
@@ -91,19 +177,55 @@ with col2:
         user_prompt = st.session_state.user_prompt
 
     if generate_btn and user_prompt:
+        # ?profile=1 (or =sample / =cprofile) profiles this request; PROFILE_SAMPLE_RATE picks others
+        profile_param = st.query_params.get("profile")
+        force_profile = True if profile_param in ("1", "true") else profile_param
+        
         with st.spinner("🤖 Generating your HTML app..."):
             try:
                 # Generate HTML code
-                html_code = generator.generate_html(user_prompt)
+                with profiling.maybe_profile(f"generate {user_prompt}", force=force_profile) as request_profile:
+                    html_code = generator.generate_html(user_prompt)
+                if request_profile is not None:
+                    st.session_state.last_profile = request_profile.summary()
                 
                 # Store in session state
                 st.session_state.generated_html = html_code
                 st.session_state.current_prompt = user_prompt
                 
+                # Keep it in the history so it can be brought back without regenerating
+                st.session_state.history_digest = history.add(st.session_state.session_id, user_prompt, html_code)
+                
             except Exception as e:
                 st.error(f"Error generating code: {str(e)}")
                 html_code = None
     
+    # Switch between past results of this session
+    history_entries = history.entries(st.session_state.session_id)
+    if len(history_entries) > 1:
+        def restore_from_history():
+            digest = st.session_state.history_choice
+            restored_html = history.get(st.session_state.session_id, digest)
+            if restored_html is not None:
+                st.session_state.generated_html = restored_html
+                st.session_state.current_prompt = next(e['prompt'] for e in history_entries if e['digest'] == digest)
+                st.session_state.history_digest = digest
+        
+        digests = [e['digest'] for e in history_entries]
+        current_digest = st.session_state.get('history_digest')
+        # Generating or editing changes the page without touching the widget, so keep it on the page shown
+        st.session_state.history_choice = current_digest if current_digest in digests else digests[0]
+        st.selectbox(
+            "🕘 Previous results:",
+            digests,
+            format_func=lambda d: next(
+                f"{time.strftime('%H:%M:%S', time.localtime(e['created']))} · {e['prompt'][:60]}"
+                for e in history_entries if e['digest'] == d
+            ),
+            key='history_choice',
+            on_change=restore_from_history
+        )
+    
     # Display generated code and preview
     if 'generated_html' in st.session_state:
         html_code = st.session_state.generated_html
@@ -112,12 +234,10 @@ with col2:
         tab1, tab2 = st.tabs(["📄 Generated Code", "👁️ Live Preview"])
         
         with tab1:
-            st.code(html_code, language='html')
+            show_source(html_code)
             
             # Download button
-            b64_html = base64.b64encode(html_code.encode()).decode()
-            href = f'<a href="data:text/html;base64,{b64_html}" download="generated_app.html">📥 Download HTML File</a>'
-            st.markdown(href, unsafe_allow_html=True)
+            show_download(html_code)
         
         with tab2:
             # Live HTML preview
@@ -126,6 +246,43 @@ with col2:
             except Exception as e:
                 st.error(f"Preview error: {str(e)}")
                 st.text("Preview not available for this generated code")
+        
+        # Refine the current page without regenerating all of it
+        edit_instruction = st.text_input(
+            "✏️ Refine this app:",
+            placeholder="e.g., make the buttons blue",
+            key='edit_instruction'
+        )
+        if st.button("Apply Edit", disabled=not edit_instruction):
+            with st.spinner("✏️ Editing your HTML app..."):
+                edited_html, edit_info = generator.edit_html(html_code, edit_instruction)
+            if edited_html is None:
+                st.warning(f"Could not apply this edit to {edit_info['section']}. Try rephrasing or regenerate the app.")
+            else:
+                st.session_state.generated_html = edited_html
+                st.session_state.current_prompt = f"{st.session_state.get('current_prompt', '')} → {edit_instruction}"
+                st.session_state.history_digest = history.add(
+                    st.session_state.session_id, st.session_state.current_prompt, edited_html
+                )
+                st.session_state.last_edit = (
+                    f"Edited {edit_info['section']} via {edit_info['method']} "
+                    f"({edit_info['section_chars']} of {edit_info['document_chars']} characters)"
+                )
+                st.rerun()
+        if 'last_edit' in st.session_state:
+            st.caption(st.session_state.last_edit)
+
+# Debug panel with the last profiled request
+if 'last_profile' in st.session_state:
+    with st.expander("🐞 Debug: Request Profile", expanded=False):
+        last_profile = st.session_state.last_profile
+        st.markdown(f"**{last_profile['label']}** took {last_profile['seconds']}s ({last_profile['mode']} profiler)")
+        for kind, path in last_profile['paths'].items():
+            st.text(f"{kind}: {path}")
+        st.dataframe(
+            [{"function": name, "self (s)": own, "total (s)": total} for name, own, total in last_profile['top']],
+            use_container_width=True
+        )
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,342 @@
+"""
+Durable SQLite job queue for bulk page generation against any OpenAI-compatible endpoint
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+BATCH_DB = os.getenv("BATCH_DB", "batch_jobs.db")
+MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "5"))
+
+# Seconds without an update after which a running job counts as abandoned by its runner
+LEASE_SECONDS = float(os.getenv("BATCH_LEASE_SECONDS", "300"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, not_before, id);
+"""
+
+
+class JobQueue:
+    """Jobs move pending -> running -> done, or back to pending with a backoff until MAX_ATTEMPTS"""
+
+    def __init__(self, path=BATCH_DB, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers proceed while a worker commits
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, descriptions, batch=None):
+        """Queue descriptions in one transaction and return the batch name"""
+        batch = batch or time.strftime("batch-%Y%m%d-%H%M%S")
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO jobs (batch, description, created, updated) VALUES (?, ?, ?, ?)",
+                [(batch, d.strip(), now, now) for d in descriptions if d.strip()],
+            )
+        return batch
+
+    def recover(self, stale_after=LEASE_SECONDS):
+        """Return jobs left running by a crashed or killed run to the queue.
+
+        Only jobs whose lease (last update) is older than stale_after seconds are taken back,
+        so jobs in flight in another runner on the same database are left alone.
+        """
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'pending', updated = ? WHERE status = 'running' AND updated < ?",
+                (now, now - stale_after),
+            ).rowcount
+
+    def renew(self, job_id):
+        """Extend a running job's lease, e.g. right before its request is sent"""
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE jobs SET updated = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+    def claim(self):
+        """Atomically take the next runnable job as (id, description), or None"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, description FROM jobs WHERE status = 'pending' AND not_before <= ? ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (now, row[0]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def complete(self, job_id, html):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated = ? WHERE id = ?",
+                (html, time.time(), job_id),
+            )
+
+    def fail(self, job_id, error, retry_after=None):
+        """Schedule a retry with exponential backoff, or give up after max_attempts"""
+        conn = self._conn()
+        with conn:
+            attempts = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                    (str(error)[:500], time.time(), job_id),
+                )
+            else:
+                delay = retry_after if retry_after is not None else min(60, 2 ** attempts)
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', error = ?, not_before = ?, updated = ? WHERE id = ?",
+                    (str(error)[:500], time.time() + delay, time.time(), job_id),
+                )
+
+    def requeue(self, job_id, error, delay):
+        """Put a job back after a rate limit without using up one of its attempts"""
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = MAX(0, attempts - 1), error = ?, not_before = ?, "
+                "updated = ? WHERE id = ?",
+                (str(error)[:500], now + delay, now, job_id),
+            )
+
+    def counts(self, batch=None):
+        """{status: count}, optionally for one batch"""
+        query = "SELECT status, COUNT(*) FROM jobs" + (" WHERE batch = ?" if batch else "") + " GROUP BY status"
+        return dict(self._conn().execute(query, (batch,) if batch else ()).fetchall())
+
+    def outstanding(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+        ).fetchone()[0]
+
+    def export(self, out_dir, batch=None):
+        """Write finished pages to out_dir/<id>.html and return how many were written"""
+        os.makedirs(out_dir, exist_ok=True)
+        query = "SELECT id, result FROM jobs WHERE status = 'done'" + (" AND batch = ?" if batch else "")
+        written = 0
+        for job_id, html in self._conn().execute(query, (batch,) if batch else ()):
+            with open(os.path.join(out_dir, f"{job_id}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+            written += 1
+        return written
+
+
+class _AdaptiveLimiter:
+    """Concurrency and request-rate limits that back off on 429s and recover slowly (AIMD)"""
+
+    def __init__(self, max_concurrency, max_rps):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.min_interval = 1.0 / max_rps if max_rps else 0.0
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._next_start = 0.0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                wait = max(self.paused_until, self._next_start) - now
+                if self.in_flight < self.limit and wait <= 0:
+                    self.in_flight += 1
+                    self._next_start = now + self.min_interval
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else 0.5)
+
+    def release(self, rate_limited=False, retry_after=None):
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                self.paused_until = max(self.paused_until, time.time() + (retry_after or 1.0))
+            else:
+                self._successes += 1
+                # One more slot after a full window of successes at the current limit
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def run_queue(queue, base_url=None, api_key=None, concurrency=8, max_rps=None, timeout=120, progress=None):
+    """Work through every runnable job and return the final counts"""
+    from generator import HTMLGenerator
+    from validator import validate_html
+
+    base_url = (base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")).rstrip("/")
+    api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+    page_builder = HTMLGenerator(load_models=False)
+    page_builder.trace_recorder = None
+    limiter = _AdaptiveLimiter(concurrency, max_rps)
+    session = requests.Session()
+    # Longer than any single request, so only jobs of runners that died are taken back
+    lease = max(LEASE_SECONDS, timeout + 60)
+    queue.recover(lease)
+    next_recover = time.time() + lease
+
+    def process(job_id, description):
+        limiter.acquire()
+        rate_limited, retry_after = False, None
+        try:
+            # Waiting for the limiter does not count against the lease
+            queue.renew(job_id)
+            response = session.post(
+                f"{base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                json=page_builder._openai_payload(description),
+                timeout=timeout,
+            )
+            if response.status_code == 429:
+                rate_limited, retry_after = True, _retry_after(response)
+                queue.requeue(job_id, "429 rate limited", retry_after or 1.0)
+            elif response.status_code != 200:
+                queue.fail(job_id, f"HTTP {response.status_code}", retry_after=_retry_after(response))
+            else:
+                html = page_builder.clean_generated_html(response.json()["choices"][0]["message"]["content"])
+                validation = validate_html(html)
+                if validation.acceptable:
+                    queue.complete(job_id, html)
+                else:
+                    queue.fail(job_id, f"invalid HTML (score {validation.score})")
+        except Exception as e:
+            queue.fail(job_id, e)
+        finally:
+            limiter.release(rate_limited, retry_after)
+
+    def worker():
+        nonlocal next_recover
+        while True:
+            job = queue.claim()
+            if job is None:
+                # Jobs may still be backing off or running in another worker or runner
+                if queue.outstanding() == 0:
+                    return
+                if time.time() >= next_recover:
+                    next_recover = time.time() + lease
+                    queue.recover(lease)
+                time.sleep(0.2)
+                continue
+            process(*job)
+            if progress:
+                progress(queue.counts())
+
+    threads = [threading.Thread(target=worker, name=f"batch-worker-{i}", daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return queue.counts()
+
+
+def selftest(jobs=200, concurrency=16):
+    """End-to-end run against a local mock server that injects latency, 500s and 429s"""
+    import tempfile
+    from load_test import MockOpenAIServer
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            MockOpenAIServer(latency=0.05, error_rate=0.05, rate_limit_rate=0.05) as mock:
+        queue = JobQueue(os.path.join(tmp, "jobs.db"), max_attempts=10)
+        batch = queue.submit([f"Test page number {i}" for i in range(jobs)])
+
+        started = time.time()
+        counts = run_queue(queue, base_url=mock.url, api_key="mock-key", concurrency=concurrency)
+        elapsed = time.time() - started
+
+        exported = queue.export(os.path.join(tmp, "out"), batch)
+        print(f"{counts} in {elapsed:.1f}s ({mock.requests} mock requests, {exported} pages exported)")
+        return counts.get("done", 0) == jobs and exported == jobs
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Bulk page generation through a durable job queue")
+    parser.add_argument("--db", default=BATCH_DB, help="SQLite database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    submit_cmd = sub.add_parser("submit", help="queue one description per line of a file")
+    submit_cmd.add_argument("file")
+    submit_cmd.add_argument("--batch", default=None)
+
+    run_cmd = sub.add_parser("run", help="process queued jobs (resumes interrupted runs)")
+    run_cmd.add_argument("--base-url", default=None, help="OpenAI-compatible base URL (default OPENAI_BASE_URL)")
+    run_cmd.add_argument("--concurrency", type=int, default=8)
+    run_cmd.add_argument("--rps", type=float, default=None, help="maximum requests started per second")
+
+    sub.add_parser("status", help="job counts per status")
+
+    export_cmd = sub.add_parser("export", help="write finished pages as HTML files")
+    export_cmd.add_argument("out_dir")
+    export_cmd.add_argument("--batch", default=None)
+
+    sub.add_parser("selftest", help="end-to-end run against a local mock server")
+    args = parser.parse_args()
+
+    if args.command == "selftest":
+        sys.exit(0 if selftest() else 1)
+
+    job_queue = JobQueue(args.db)
+    if args.command == "submit":
+        with open(args.file, encoding="utf-8") as f:
+            print(f"✅ Queued as {job_queue.submit(f.readlines(), args.batch)}: {job_queue.counts()}")
+    elif args.command == "run":
+        print(run_queue(job_queue, args.base_url, concurrency=args.concurrency, max_rps=args.rps))
+    elif args.command == "status":
+        print(job_queue.counts())
+    elif args.command == "export":
+        print(f"✅ {job_queue.export(args.out_dir, args.batch)} pages written to {args.out_dir}")
@@ -0,0 +1,18 @@
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+
+from generator import HTMLGenerator
+
+
+@pytest.fixture(scope="session")
+def generator():
+    """Template-only HTMLGenerator shared by every test module"""
+    return HTMLGenerator(load_models=False)
+
+
+@pytest.fixture(scope="session")
+def templates(generator):
+    return generator.templates
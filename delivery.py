@@ -0,0 +1,110 @@
+"""
+Download artifacts for generated pages: hashed, optionally minified and gzipped
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Source views above this size are truncated unless the user asks for the full document
+CODE_PREVIEW_LIMIT = int(os.getenv("DELIVERY_CODE_PREVIEW_KB", "50")) * 1024
+
+# Number of prepared artifacts kept in memory
+ARTIFACT_CACHE_SIZE = int(os.getenv("DELIVERY_CACHE_SIZE", "64"))
+
+_RAW_BLOCK = re.compile(r'(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>)', re.DOTALL | re.IGNORECASE)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _minify_css(css):
+    css = _CSS_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    # Only after the colon: "a :hover" and "a:hover" are different selectors
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def _minify_js(js):
+    # Newlines are kept so automatic semicolon insertion behaves exactly as before
+    lines = js.split('\n')
+    if '`' in js:
+        # Template literals would change if their indentation was stripped
+        return '\n'.join(line.rstrip() for line in lines if line.strip()).strip('\n')
+    return '\n'.join(line.strip() for line in lines if line.strip())
+
+
+def minify_html(html):
+    """Conservative minification: collapses markup whitespace, CSS and script indentation"""
+    parts = []
+    last = 0
+    for match in _RAW_BLOCK.finditer(html):
+        parts.append(_minify_markup(html[last:match.start()]))
+        open_tag, tag, body, close_tag = match.group(1), match.group(2).lower(), match.group(3), match.group(4)
+        if tag == 'style':
+            body = _minify_css(body)
+        elif tag == 'script':
+            body = _minify_js(body)
+        parts.append(open_tag + body + close_tag)
+        last = match.end()
+    parts.append(_minify_markup(html[last:]))
+    return ''.join(parts).strip()
+
+
+def _minify_markup(markup):
+    markup = _HTML_COMMENT.sub('', markup)
+    # A single space renders exactly like any longer whitespace run between inline elements
+    return re.sub(r'\s+', ' ', markup).replace('> <', '>\n<')
+
+
+class Artifact:
+    def __init__(self, html, minify=False, compress=False):
+        self.digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        self.html = minify_html(html) if minify else html
+        body = self.html.encode('utf-8')
+        self.original_size = len(html.encode('utf-8'))
+
+        if compress:
+            # mtime=0 keeps the gzip bytes (and thus the download) identical for identical pages
+            self.data = gzip.compress(body, compresslevel=9, mtime=0)
+            self.file_name = f"generated_app_{self.digest[:8]}.html.gz"
+            self.mime = "application/gzip"
+        else:
+            self.data = body
+            self.file_name = f"generated_app_{self.digest[:8]}.html"
+            self.mime = "text/html"
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+def prepare_artifact(html, minify=False, compress=False):
+    """Artifact for a page, reused across reruns and sessions when the page is unchanged"""
+    key = (hashlib.sha256(html.encode('utf-8')).hexdigest(), minify, compress)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    artifact = Artifact(html, minify=minify, compress=compress)
+    with _cache_lock:
+        _cache[key] = artifact
+        while len(_cache) > ARTIFACT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return artifact
+
+
+def code_preview(html, limit=CODE_PREVIEW_LIMIT):
+    """(source to display, whether it was truncated)"""
+    if len(html) <= limit:
+        return html, False
+    cut = html.rfind('\n', 0, limit)
+    return html[:cut if cut > 0 else limit], True
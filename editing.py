@@ -0,0 +1,228 @@
+"""
+Incremental edits: find the part of a page an instruction targets, patch it and splice it back
+"""
+
+import re
+from html.parser import HTMLParser
+
+from validator import VOID_ELEMENTS, StructureValidator
+
+_STYLE_WORDS = {
+    'color', 'colour', 'colors', 'colours', 'background', 'font', 'fonts', 'bigger', 'smaller', 'larger',
+    'rounded', 'round', 'border', 'borders', 'dark', 'light', 'theme', 'style', 'styling', 'css', 'spacing',
+    'padding', 'margin', 'shadow', 'gradient', 'bold', 'italic', 'size', 'width', 'height', 'center',
+    'centered', 'align', 'look', 'prettier',
+}
+_SCRIPT_WORDS = {
+    'function', 'functionality', 'behavior', 'behaviour', 'javascript', 'js', 'logic', 'save', 'store',
+    'localstorage', 'persist', 'validate', 'validation', 'keyboard', 'shortcut', 'shortcuts', 'calculate',
+    'handler', 'alert', 'animation', 'animate', 'sort', 'filter', 'count', 'counter',
+}
+_MARKUP_WORDS = {'add', 'insert', 'remove', 'delete', 'rename', 'text', 'label', 'heading', 'title', 'placeholder'}
+
+COLOR_NAMES = {
+    'red', 'blue', 'green', 'yellow', 'orange', 'purple', 'pink', 'black', 'white', 'gray', 'grey', 'teal',
+    'navy', 'maroon', 'olive', 'lime', 'aqua', 'cyan', 'magenta', 'indigo', 'violet', 'gold', 'silver',
+    'brown', 'coral', 'crimson', 'turquoise', 'salmon', 'tomato', 'orchid',
+}
+
+# Element words in instructions -> CSS selectors of the usual markup for them
+_TARGET_SELECTORS = [
+    ({'button', 'buttons'}, 'button'),
+    ({'input', 'inputs', 'field', 'fields', 'textbox'}, 'input, textarea'),
+    ({'header', 'heading', 'headings', 'title'}, 'h1, .header'),
+    ({'display', 'screen'}, '.display'),
+    ({'card', 'container', 'box', 'panel'}, '.container, .calculator, .form-container'),
+    ({'text', 'font', 'fonts'}, 'body'),
+    ({'background', 'page'}, 'body'),
+]
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9#-]+", text.lower())
+
+
+class Section:
+    """A [start, end) slice of the document that an edit replaces"""
+
+    def __init__(self, kind, start, end, name):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.name = name
+
+    def text(self, html):
+        return html[self.start:self.end]
+
+
+class _ElementLocator(HTMLParser):
+    """Records the character span of every element and of its contents"""
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=False)
+        self.line_starts = [0]
+        for match in re.finditer('\n', html):
+            self.line_starts.append(match.end())
+        self.elements = []
+        self._open = []
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self.line_starts[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        attrs = dict(attrs)
+        end = start + len(self.get_starttag_text() or '')
+        if tag in VOID_ELEMENTS:
+            self.elements.append((tag, attrs, start, end, end, end))
+            return
+        self._open.append((tag, attrs, start, end))
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i][0] == tag:
+                open_tag, attrs, start, content_start = self._open[i]
+                del self._open[i:]
+                close_start = self._offset()
+                close_end = close_start + len(f'</{tag}>')
+                # (tag, attrs, element start, content start, content end, element end)
+                self.elements.append((tag, attrs, start, content_start, close_start, close_end))
+                return
+
+
+def _named_element(elements, words):
+    """(tag, attrs, start, end) of the smallest element the words name by id or class, or None"""
+    # Singular/plural alike; markup verbs such as "add" are not element names
+    nouns = {w.rstrip('s') for w in words - _MARKUP_WORDS}
+    candidates = []
+    for tag, attrs, start, _, _, end in elements:
+        names = set(re.split(r'[\s_-]+', f"{attrs.get('id') or ''} {attrs.get('class') or ''}".lower())) - {''}
+        if tag in ('html', 'head', 'body', 'style', 'script') or not names:
+            continue
+        if nouns & {name.rstrip('s') for name in names}:
+            candidates.append((end - start, start, end, tag, attrs))
+    if not candidates:
+        return None
+    _, start, end, tag, attrs = min(candidates)
+    return tag, attrs, start, end
+
+
+def find_section(html, instruction):
+    """Pick the smallest section of the page the instruction is about"""
+    words = set(_words(instruction))
+    locator = _ElementLocator(html)
+    locator.feed(html)
+    elements = locator.elements
+
+    def block(tag):
+        for el_tag, _, _, content_start, content_end, _ in elements:
+            if el_tag == tag:
+                return content_start, content_end
+        return None
+
+    style_score = len(words & (_STYLE_WORDS | COLOR_NAMES)) + any(w.startswith('#') for w in words)
+    script_score = len(words & _SCRIPT_WORDS)
+    markup_score = len(words & _MARKUP_WORDS)
+
+    if style_score and style_score >= script_score and style_score >= markup_score and block('style'):
+        start, end = block('style')
+        return Section('style', start, end, '<style>')
+    if script_score and script_score > markup_score and block('script'):
+        start, end = block('script')
+        return Section('script', start, end, '<script>')
+
+    named = _named_element(elements, words)
+    if named:
+        tag, attrs, start, end = named
+        label = f"#{attrs['id']}" if attrs.get('id') else f".{attrs.get('class', '').split()[0]}"
+        return Section('element', start, end, f"<{tag}{label}>")
+
+    # The page title is the visible main heading, which usually has no id or class to name it by
+    if words & {'title', 'heading', 'header'}:
+        headings = [(start, end) for tag, _, start, _, _, end in elements if tag == 'h1']
+        if headings:
+            start, end = min(headings)
+            return Section('element', start, end, '<h1>')
+
+    body = block('body')
+    if body:
+        return Section('body', body[0], body[1], '<body>')
+    return Section('document', 0, len(html), 'document')
+
+
+def splice(html, section, patch):
+    """Replace the section with the patch"""
+    return html[:section.start] + patch + html[section.end:]
+
+
+def patch_is_valid(section, patch):
+    """Reject patches that would break the structure around the section"""
+    if not patch or not patch.strip():
+        return False
+    if section.kind == 'style':
+        return '<' not in patch and patch.count('{') == patch.count('}')
+    if section.kind == 'script':
+        return '</script' not in patch.lower()
+    if re.search(r'<(!doctype|html|head|body)\b', patch, re.IGNORECASE):
+        # A whole page came back instead of the part that was asked for
+        return False
+
+    validator = StructureValidator()
+    validator.feed(patch)
+    result = validator.result(final=False)
+    balanced = not validator.stack and not getattr(validator, 'cdata_elem', None)
+    return balanced and not result.problems
+
+
+def extract_patch(text):
+    """Strip markdown fences and chatter around a model-generated section"""
+    fenced = re.search(r'```[a-zA-Z]*\n(.*?)```', text, re.DOTALL)
+    return (fenced.group(1) if fenced else text).strip('\n')
+
+
+def rule_based_patch(html, section, instruction):
+    """Deterministic style edits for common requests (colors, dark mode, sizes, rounding)"""
+    if section.kind != 'style':
+        return None
+
+    words = _words(instruction)
+    word_set = set(words)
+    color = next((w for w in words if w in COLOR_NAMES or re.fullmatch(r'#[0-9a-f]{3}([0-9a-f]{3})?', w)), None)
+    selector = next((sel for names, sel in _TARGET_SELECTORS if names & word_set), None)
+
+    # An element the generic selectors do not cover (e.g. ".todo-item") is left to the model
+    needs_target = color or word_set & {'bigger', 'larger', 'smaller', 'rounded', 'round', 'center', 'centered'}
+    if needs_target and selector is None:
+        locator = _ElementLocator(html)
+        locator.feed(html)
+        if _named_element(locator.elements, word_set):
+            return None
+
+    rules = []
+    if 'dark' in word_set:
+        rules.append("body { background: #1e1e2e !important; color: #e0e0e0 !important; }")
+        rules.append(".container, .calculator, .form-container, .todo-item { background: #2a2a3c !important; color: #e0e0e0 !important; }")
+    if color:
+        target = selector or 'button'
+        prop = 'color' if word_set & {'text', 'font', 'fonts'} else 'background'
+        rules.append(f"{target} {{ {prop}: {color} !important; }}")
+        if prop == 'background' and target != 'body':
+            rules.append(f"{target}:hover {{ filter: brightness(0.9); }}")
+    if word_set & {'bigger', 'larger'}:
+        rules.append(f"{selector or 'body'} {{ font-size: 1.2em !important; }}")
+    if 'smaller' in word_set:
+        rules.append(f"{selector or 'body'} {{ font-size: 0.85em !important; }}")
+    if word_set & {'rounded', 'round'}:
+        rules.append(f"{selector or 'button, input, textarea'} {{ border-radius: 12px !important; }}")
+    if word_set & {'center', 'centered'}:
+        rules.append(f"{selector or 'body'} {{ text-align: center; }}")
+
+    if not rules:
+        return None
+    # Later rules win, so appending leaves the rest of the stylesheet untouched
+    existing = section.text(html).rstrip()
+    indent = re.search(r'\n([ \t]*)\S', section.text(html))
+    indent = indent.group(1) if indent else '    '
+    comment = re.sub(r'\*/', '', instruction.strip())[:80]
+    return existing + f"\n{indent}/* Edit: {comment} */\n" + "\n".join(indent + rule for rule in rules) + "\n" + indent[:-4]
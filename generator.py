@@ -4,23 +4,52 @@ import random
 import requests
 import json
 import os
+import time
+import model_store
+import model_probe
+from memory_manager import MemoryManager
+from router import TemplateRouter, TEMPLATE_KEYWORDS
+from validator import validate_html
+import speculative
+import thread_tuning
+import tracing
+import editing
+from template_catalog import TemplateCatalog, choose_variant
 
 class HTMLGenerator:
-    def __init__(self):
+    def __init__(self, load_models=True):
         self.use_openai = False
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        # Any OpenAI-compatible server (e.g. a local mock for load tests)
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip('/')
         if self.openai_api_key:
             self.use_openai = True
         
         # Load templates for fallback
         self.templates = self._load_templates()
         
+        # Themed/layout variants of the templates, rendered ahead of time
+        self.catalog = TemplateCatalog(self.templates)
+        
+        # Sends prompts a template confidently covers straight to the template path
+        self.router = TemplateRouter()
+        
         # Initialize model properties
         self.generator = None
         self.model_name = "none"
+        self.thread_tuning = None
+        
+        # Unloads the model when idle and keeps the process inside its memory budget
+        self.memory = MemoryManager(self, load_model=self._reload_model)
+        
+        # Appends every request to TRACE_FILE when tracing is enabled
+        self.trace_recorder = tracing.get_recorder()
         
         # Try to load DeepSeek Coder or fallback models
-        self._try_load_simple_model()
+        if load_models:
+            self._try_load_simple_model()
+        else:
+            self.model_name = "template"
       
     def _try_load_simple_model(self):
         """Try to load lightweight AI models optimized for Streamlit"""
@@ -55,27 +84,57 @@ class HTMLGenerator:
                 }
             ]
             
+            # Probe every candidate in parallel so a broken model costs a config fetch, not a full load
+            probe_results = model_probe.probe_models([m["name"] for m in lightweight_models])
+            
+            # GPT2 quality at close to DistilGPT2 speed when both models are available
+            if speculative.DECODING_MODE == "speculative":
+                if self._try_load_speculative_model(probe_results):
+                    return
+            
             for model_config in lightweight_models:
+                probe = probe_results[model_config["name"]]
+                if not probe["ok"]:
+                    st.info(f"⏭️ Skipping {model_config['display_name']}: {probe['error']}")
+                    continue
+                
+                if not self.memory.allows_load(model_config["name"]):
+                    st.warning(f"⚠️ {model_config['display_name']}: Skipped, loading it would exceed the memory budget")
+                    continue
+                
                 try:
-                    st.info(f"🔄 Loading {model_config['display_name']} (lightweight)...")
+                    # Prefer the memory-mapped local snapshot: fast, offline and shared between workers
+                    self.generator = model_store.load_pipeline(model_config["name"])
                     
-                    # Use CPU-only, lightweight configuration
-                    self.generator = pipeline(
-                        "text-generation",
-                        model=model_config["name"],
-                        device=-1,  # Force CPU usage
-                        model_kwargs={"low_cpu_mem_usage": True}
-                    )
+                    if self.generator is None:
+                        st.info(f"🔄 Loading {model_config['display_name']} (lightweight)...")
+                        
+                        # Use CPU-only, lightweight configuration
+                        self.generator = pipeline(
+                            "text-generation",
+                            model=model_config["name"],
+                            device=-1,  # Force CPU usage
+                            model_kwargs={"low_cpu_mem_usage": True}
+                        )
+                        
+                        # Snapshot it so the next start loads from the store
+                        try:
+                            model_store.save_snapshot(model_config["name"], self.generator.model, self.generator.tokenizer)
+                        except Exception as e:
+                            st.warning(f"⚠️ Could not snapshot {model_config['display_name']}: {str(e)}")
                     
                     self.model_name = model_config["model_id"]
                     self.model_config = model_config
                     
+                    self._tune_threads()
+                    
                     st.success(f"✅ {model_config['display_name']} loaded successfully!")
                     st.info("💡 Using lightweight model optimized for Streamlit performance")
                     return
                     
                 except Exception as e:
                     error_msg = str(e)
+                    model_store.mark_unavailable(model_config["name"], e)
                     if "429" in error_msg or "rate limit" in error_msg.lower():
                         st.warning(f"⚠️ {model_config['display_name']}: Rate limited. Trying next model...")
                     else:
@@ -96,6 +155,61 @@ class HTMLGenerator:
             self.generator = None
             self.model_name = "template"
     
+    def _try_load_speculative_model(self, probe_results):
+        """Load GPT2 with DistilGPT2 as its draft model for speculative decoding"""
+        names = [speculative.TARGET_MODEL, speculative.DRAFT_MODEL]
+        if not all(probe_results.get(name, {}).get("ok") for name in names):
+            st.warning("⚠️ Speculative decoding needs both GPT2 and DistilGPT2. Using standard decoding.")
+            return False
+        if not all(self.memory.allows_load(name) for name in names):
+            st.warning("⚠️ Speculative decoding would exceed the memory budget. Using standard decoding.")
+            return False
+        
+        try:
+            st.info("🔄 Loading GPT2 with DistilGPT2 draft model (speculative decoding)...")
+            self.generator = speculative.SpeculativeGenerator()
+            self.model_name = "gpt2-speculative"
+            self.model_config = {
+                "name": speculative.TARGET_MODEL,
+                "display_name": "GPT2 + DistilGPT2 draft",
+                "max_length": 256,
+                "temperature": 0.8,
+                "model_id": "gpt2-speculative"
+            }
+            self._tune_threads()
+            st.success("✅ GPT2 with speculative decoding loaded successfully!")
+            return True
+        except Exception as e:
+            st.warning(f"⚠️ Speculative decoding unavailable: {str(e)}. Using standard decoding.")
+            self.generator = None
+            return False
+    
+    def _reload_model(self, model_config):
+        """Load the previously chosen model again, without probing or UI messages (idle reload)"""
+        if model_config["model_id"] == "gpt2-speculative":
+            return speculative.SpeculativeGenerator()
+        
+        generator = model_store.load_pipeline(model_config["name"])
+        if generator is None:
+            from transformers import pipeline
+            generator = pipeline(
+                "text-generation",
+                model=model_config["name"],
+                device=-1,
+                model_kwargs={"low_cpu_mem_usage": True}
+            )
+        return generator
+    
+    def _tune_threads(self):
+        """Size torch's thread pools to this worker's share of the CPU"""
+        try:
+            self.thread_tuning = thread_tuning.tune(self.generator, self.model_name)
+            if self.thread_tuning and self.thread_tuning["source"] == "calibrated":
+                st.info(f"⚙️ Calibrated {self.thread_tuning['threads']} CPU threads "
+                        f"({self.thread_tuning['tokens_per_sec']} tokens/sec)")
+        except Exception as e:
+            st.warning(f"⚠️ Thread tuning skipped: {str(e)}")
+    
     def _load_templates(self):
         """Load HTML templates for different types of apps"""
         return {
@@ -527,15 +641,24 @@ HTML:
         """Match user description to the most appropriate template"""
         description_lower = description.lower()
         
-        if any(word in description_lower for word in ['calculator', 'calc', 'math', 'arithmetic', 'number']):
-            return 'calculator'
-        elif any(word in description_lower for word in ['todo', 'task', 'list', 'checklist', 'reminder']):
-            return 'todo'
-        elif any(word in description_lower for word in ['contact', 'form', 'email', 'message', 'feedback']):
-            return 'contact'
-        else:
-            # Default to a random template
-            return random.choice(['calculator', 'todo', 'contact'])
+        for template_type, keywords in TEMPLATE_KEYWORDS.items():
+            if any(word in description_lower for word in keywords):
+                return template_type
+        
+        # Default to a random template
+        return random.choice(list(TEMPLATE_KEYWORDS))
+    
+    def _template_variant(self, template_type, description):
+        """Pre-rendered variant of a template whose theme and layout match the description"""
+        template_type = template_type if template_type in self.templates else 'calculator'
+        try:
+            theme, layout = choose_variant(description)
+            variant = self.catalog.get(template_type, theme, layout)
+            if variant:
+                return variant
+        except Exception as e:
+            st.warning(f"Template catalog unavailable: {str(e)}")
+        return self.templates[template_type]
     
     def _customize_template(self, template, description):
         """Customize the template based on the user description"""
@@ -552,38 +675,55 @@ HTML:
         
         return template
     
+    def _openai_payload(self, description):
+        """Chat completion request body for generating a complete page"""
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {
+                    "role": "system", 
+                    "content": "You are an expert web developer. Generate complete, functional HTML applications with embedded CSS and JavaScript. Always return valid HTML that works as a standalone file."
+                },
+                {
+                    "role": "user", 
+                    "content": f"Create a complete HTML web application for: {description}. Include modern CSS styling and JavaScript functionality. Make it responsive and visually appealing."
+                }
+            ],
+            "max_tokens": 2000,
+            "temperature": 0.7
+        }
+    
+    def _openai_chat(self, data):
+        """Send a chat completion request and return the message content (None on API errors)"""
+        headers = {
+            'Authorization': f'Bearer {self.openai_api_key}',
+            'Content-Type': 'application/json'
+        }
+        
+        response = requests.post(f'{self.openai_base_url}/chat/completions', headers=headers, json=data)
+        
+        if response.status_code == 200:
+            result = response.json()
+            return result['choices'][0]['message']['content']
+        else:
+            st.error(f"OpenAI API error: {response.status_code}")
+            return None
+    
     def _generate_with_openai(self, description):
         """Generate HTML using OpenAI API"""
         try:
-            headers = {
-                'Authorization': f'Bearer {self.openai_api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {
-                        "role": "system", 
-                        "content": "You are an expert web developer. Generate complete, functional HTML applications with embedded CSS and JavaScript. Always return valid HTML that works as a standalone file."
-                    },
-                    {
-                        "role": "user", 
-                        "content": f"Create a complete HTML web application for: {description}. Include modern CSS styling and JavaScript functionality. Make it responsive and visually appealing."
-                    }
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.7
-            }
+            content = self._openai_chat(self._openai_payload(description))
+            if content is None:
+                return None
             
-            response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data)
+            html_result = self.clean_generated_html(content)
             
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                st.error(f"OpenAI API error: {response.status_code}")
+            # Let the next tier handle structurally broken pages
+            validation = validate_html(html_result)
+            if not validation.acceptable:
+                st.info(f"🔄 OpenAI output failed validation (score {validation.score}). Trying next method...")
                 return None
+            return html_result
                 
         except Exception as e:
             st.error(f"OpenAI generation error: {str(e)}")
@@ -640,8 +780,8 @@ input, textarea {{ width: 100%; padding: 8px; margin: 5px 0; border: 1px solid #
                 # Clean and extract HTML
                 html_result = self.clean_generated_html(generated_text)
                 
-                # If AI generation is too short or incomplete, enhance with template
-                if len(html_result) < 500 or not html_result.strip().endswith('</html>'):
+                # If AI generation is structurally broken or incomplete, enhance with template
+                if not validate_html(html_result).acceptable:
                     st.info("🔄 Enhancing AI output with template structure...")
                     return self._enhance_ai_with_template(description, html_result)
                 
@@ -779,7 +919,7 @@ input, textarea {{ width: 100%; padding: 8px; margin: 5px 0; border: 1px solid #
         try:
             # Get the best template match
             template_type = self._match_description_to_template(description)
-            template = self.templates.get(template_type, self.templates['calculator'])
+            template = self._template_variant(template_type, description)
             
             # Extract any useful content from AI output
             if ai_output and len(ai_output) > 100:
@@ -799,28 +939,146 @@ input, textarea {{ width: 100%; padding: 8px; margin: 5px 0; border: 1px solid #
             st.warning(f"Template enhancement error: {str(e)}")
             return self.create_fallback_html(description)
     
+    def edit_html(self, html, instruction):
+        """Apply an edit instruction by regenerating only the section of the page it targets
+        
+        Returns (edited html or None, info) where info names the section, the method used
+        and how much of the document was sent to the backend.
+        """
+        section = editing.find_section(html, instruction)
+        original = section.text(html)
+        info = {
+            "section": section.name,
+            "section_chars": len(original),
+            "document_chars": len(html),
+            "method": None
+        }
+        
+        try:
+            # Common style edits need no model at all
+            patch = editing.rule_based_patch(html, section, instruction)
+            if patch is not None:
+                info["method"] = "rules"
+            
+            if patch is None and self.use_openai:
+                patch = self._edit_with_openai(original, section, instruction)
+                if patch is not None:
+                    info["method"] = "openai"
+            
+            if patch is None and self.generator and self.memory.within_budget():
+                self.memory.touch()
+                patch = self._edit_with_simple_model(original, section, instruction)
+                if patch is not None:
+                    info["method"] = "model"
+            
+            if patch is None:
+                return None, info
+            return editing.splice(html, section, patch), info
+            
+        except Exception as e:
+            st.error(f"Edit error: {str(e)}")
+            return None, info
+    
+    def _edit_with_openai(self, original, section, instruction):
+        """Ask OpenAI for a replacement of just the targeted section"""
+        data = {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You edit one part of an HTML page. Reply with only the updated part, exactly replacing the text you were given, with no explanations."
+                },
+                {
+                    "role": "user",
+                    "content": f"Instruction: {instruction}\n\nPart to edit ({section.name} contents):\n```\n{original}\n```"
+                }
+            ],
+            # The reply is about as long as the section, not the whole page
+            "max_tokens": min(2000, len(original) // 3 + 200),
+            "temperature": 0.3
+        }
+        
+        content = self._openai_chat(data)
+        if content is None:
+            return None
+        patch = editing.extract_patch(content)
+        return patch if editing.patch_is_valid(section, patch) else None
+    
+    def _edit_with_simple_model(self, original, section, instruction):
+        """Let the local model write one CSS rule for the instruction (other sections are beyond it)"""
+        if section.kind != 'style':
+            return None
+        
+        prompt = f"{original.rstrip()}\n/* {instruction} */\n"
+        result = self.generator(
+            prompt,
+            max_new_tokens=60,
+            num_return_sequences=1,
+            temperature=self.model_config["temperature"] if hasattr(self, 'model_config') else 0.8,
+            do_sample=True,
+            pad_token_id=50256,
+            truncation=True
+        )
+        continuation = result[0]['generated_text']
+        if continuation.startswith(prompt):
+            continuation = continuation[len(prompt):]
+        
+        rule = re.match(r'\s*([^{}<]+\{[^{}<]*\})', continuation)
+        if not rule:
+            return None
+        patch = prompt + rule.group(1) + "\n"
+        return patch if editing.patch_is_valid(section, patch) else None
+    
     def generate_html(self, user_description):
         """Generate HTML code based on user description"""
+        started = time.perf_counter()
+        html_code, backend, backend_seconds = self._generate_html(user_description)
+        
+        # Record the request for offline replay (no-op unless TRACE_FILE is set)
+        if self.trace_recorder:
+            self.trace_recorder.record(user_description, backend, time.perf_counter() - started,
+                                       backend_seconds, html_code)
+        return html_code
+    
+    def _generate_html(self, user_description):
+        """Return (html, backend used, seconds spent in the OpenAI/model backend)"""
+        backend_seconds = 0.0
         try:
+            # Skip the model entirely when a template confidently covers the prompt
+            routed_template = self.router.route(user_description)
+            if routed_template:
+                return self._customize_template(self._template_variant(routed_template, user_description), user_description), "router", 0.0
+            
             # Try OpenAI first if available
             if self.use_openai:
+                started = time.perf_counter()
                 html_code = self._generate_with_openai(user_description)
+                backend_seconds += time.perf_counter() - started
+                self.router.record_model_time(time.perf_counter() - started)
                 if html_code:
-                    return html_code
+                    return html_code, "openai", backend_seconds
+            
+            # Bring an idle-unloaded model back in the background; templates serve meanwhile
+            self.memory.touch()
+            if self.memory.unloaded:
+                self.memory.reload_async()
             
-            # Try simple transformer model if available
-            if self.generator:
+            # Try simple transformer model if available and the process has memory to spare
+            if self.generator and self.memory.within_budget():
+                started = time.perf_counter()
                 html_code = self._generate_with_simple_model(user_description)
+                backend_seconds += time.perf_counter() - started
+                self.router.record_model_time(time.perf_counter() - started)
                 if html_code:
-                    return html_code
+                    return html_code, "model", backend_seconds
             
             # Fall back to template-based generation
             template_type = self._match_description_to_template(user_description)
-            template = self.templates.get(template_type, self.templates['calculator'])
+            template = self._template_variant(template_type, user_description)
             customized_html = self._customize_template(template, user_description)
             
-            return customized_html
+            return customized_html, "template", backend_seconds
             
         except Exception as e:
             st.error(f"Generation error: {str(e)}")
-            return self.create_fallback_html(user_description)
+            return self.create_fallback_html(user_description), "fallback", backend_seconds
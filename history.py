@@ -0,0 +1,139 @@
+"""
+Bounded, compressed and deduplicated store of past generations per session
+"""
+
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Caps on stored (compressed) bytes; the least recently used entries go first
+HISTORY_SESSION_MAX_KB = int(os.getenv("HISTORY_SESSION_MAX_KB", "512"))
+HISTORY_GLOBAL_MAX_MB = int(os.getenv("HISTORY_GLOBAL_MAX_MB", "64"))
+HISTORY_SESSION_MAX_ENTRIES = int(os.getenv("HISTORY_SESSION_MAX_ENTRIES", "20"))
+
+
+def _compress(data):
+    if zstandard is not None:
+        return b"Z" + zstandard.ZstdCompressor(level=9).compress(data)
+    return b"z" + zlib.compress(data, 9)
+
+
+def _decompress(blob):
+    if blob[:1] == b"Z":
+        return zstandard.ZstdDecompressor().decompress(blob[1:])
+    return zlib.decompress(blob[1:])
+
+
+class HistoryStore:
+    def __init__(self, session_max_bytes=HISTORY_SESSION_MAX_KB * 1024,
+                 global_max_bytes=HISTORY_GLOBAL_MAX_MB * 1024 * 1024,
+                 session_max_entries=HISTORY_SESSION_MAX_ENTRIES):
+        self.session_max_bytes = session_max_bytes
+        self.global_max_bytes = global_max_bytes
+        self.session_max_entries = session_max_entries
+
+        # digest -> [compressed blob, reference count]; identical pages are stored once
+        self._blobs = {}
+        # session id -> list of entries (oldest first); ordered by last use for LRU eviction
+        self._sessions = OrderedDict()
+        self._stored_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, session_id, prompt, html):
+        """Store a generation for a session and return its content digest"""
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            entries = self._sessions.setdefault(session_id, [])
+            self._sessions.move_to_end(session_id)
+
+            # An identical page (even from another prompt) is one entry: it moves to the front under
+            # the latest prompt, so digests stay unique within a session
+            for entry in entries:
+                if entry["digest"] == digest:
+                    entries.remove(entry)
+                    entry["prompt"] = prompt
+                    entry["created"] = time.time()
+                    entries.append(entry)
+                    return digest
+
+            if digest in self._blobs:
+                self._blobs[digest][1] += 1
+            else:
+                blob = _compress(data)
+                self._blobs[digest] = [blob, 1]
+                self._stored_bytes += len(blob)
+
+            entries.append({
+                "prompt": prompt,
+                "digest": digest,
+                "size": len(data),
+                "created": time.time(),
+            })
+            self._evict_session(session_id)
+            self._evict_global()
+            return digest
+
+    def entries(self, session_id):
+        """Past generations of a session, newest first (without the HTML)"""
+        with self._lock:
+            entries = self._sessions.get(session_id, [])
+            return [dict(entry) for entry in reversed(entries)]
+
+    def get(self, session_id, digest):
+        """HTML of a stored generation, or None if it was evicted"""
+        with self._lock:
+            if not any(e["digest"] == digest for e in self._sessions.get(session_id, [])):
+                return None
+            self._sessions.move_to_end(session_id)
+            blob = self._blobs[digest][0]
+        return _decompress(blob).decode("utf-8")
+
+    def stats(self):
+        """Store size and entry counts"""
+        with self._lock:
+            total_entries = sum(len(e) for e in self._sessions.values())
+            original = sum(entry["size"] for e in self._sessions.values() for entry in e)
+            return {
+                "sessions": len(self._sessions),
+                "entries": total_entries,
+                "unique_pages": len(self._blobs),
+                "stored_kb": round(self._stored_bytes / 1024, 1),
+                "original_kb": round(original / 1024, 1),
+            }
+
+    def _session_bytes(self, entries):
+        # Shared blobs count fully against every session holding them
+        return sum(len(self._blobs[e["digest"]][0]) for e in entries)
+
+    def _drop_entry(self, entries, index):
+        entry = entries.pop(index)
+        blob_ref = self._blobs[entry["digest"]]
+        blob_ref[1] -= 1
+        if blob_ref[1] == 0:
+            self._stored_bytes -= len(blob_ref[0])
+            del self._blobs[entry["digest"]]
+
+    def _evict_session(self, session_id):
+        entries = self._sessions[session_id]
+        while len(entries) > 1 and (len(entries) > self.session_max_entries
+                                    or self._session_bytes(entries) > self.session_max_bytes):
+            self._drop_entry(entries, 0)
+
+    def _evict_global(self):
+        # Oldest entry of the least recently used session first
+        while self._stored_bytes > self.global_max_bytes and self._sessions:
+            session_id, entries = next(iter(self._sessions.items()))
+            if entries:
+                self._drop_entry(entries, 0)
+            if not entries:
+                del self._sessions[session_id]
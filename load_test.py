@@ -0,0 +1,316 @@
+"""
+Load-testing harness: many simulated sessions against HTMLGenerator or the Streamlit app
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from memory_manager import current_rss_mb
+from tracing import percentile, summarize
+
+PROMPTS = [
+    "Create a simple to-do list app with add and delete functionality",
+    "Build a color picker tool with RGB and hex values",
+    "Make a basic calculator with arithmetic operations",
+    "Design a contact form with name, email, and message fields",
+    "Create a photo gallery with grid layout",
+    "Build a countdown timer with start, pause and reset",
+    "Make a quiz app with multiple choice questions",
+]
+
+_MOCK_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+<style>body {{ font-family: Arial, sans-serif; }}</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>{padding}</p>
+<script>console.log('mock');</script>
+</body>
+</html>"""
+
+
+class MockOpenAIServer:
+    """Local OpenAI-compatible chat completions endpoint with injectable latency and errors"""
+
+    def __init__(self, latency=1.0, error_rate=0.0, rate_limit_rate=0.0, page_size=4000, port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.page_size = page_size
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with mock._lock:
+                    mock.requests += 1
+
+                # Latency varies +-50% around the configured mean
+                time.sleep(random.uniform(0.5, 1.5) * mock.latency)
+
+                roll = random.random()
+                if roll < mock.rate_limit_rate:
+                    return self._reply(429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "1"})
+                if roll < mock.rate_limit_rate + mock.error_rate:
+                    return self._reply(500, {"error": {"message": "Injected failure"}})
+
+                prompt = body.get("messages", [{}])[-1].get("content", "")
+                page = _MOCK_PAGE.format(title=prompt[:60].replace("<", ""), padding="x" * mock.page_size)
+                self._reply(200, {
+                    "object": "chat.completion",
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": page},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(page) // 4},
+                })
+
+            def _reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubModel:
+    """Pipeline-compatible stand-in that costs a fixed time per generated token"""
+
+    def __init__(self, seconds_per_token=0.01, new_tokens=64):
+        self.seconds_per_token = seconds_per_token
+        self.new_tokens = new_tokens
+
+    def __call__(self, prompt, **kwargs):
+        time.sleep(self.seconds_per_token * self.new_tokens)
+        return [{"generated_text": prompt + "Generated App</h1>\n</div>\n</body>\n</html>"}]
+
+
+def tiny_model():
+    """Randomly initialised two-layer GPT2 using a locally available GPT2 tokenizer"""
+    import model_store
+    from transformers import AutoTokenizer, GPT2Config, GPT2LMHeadModel, pipeline
+
+    tokenizer_source = model_store.snapshot_path("distilgpt2") if model_store.has_snapshot("distilgpt2") else "distilgpt2"
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_source, local_files_only=True)
+    model = GPT2LMHeadModel(GPT2Config(n_layer=2, n_head=2, n_embd=64, vocab_size=tokenizer.vocab_size)).eval()
+    return pipeline("text-generation", model=model, tokenizer=tokenizer, device=-1)
+
+
+def _install_model(gen, model):
+    """Use an offline model ("stub"/"tiny") or none at all instead of the hub models"""
+    if model == "stub":
+        gen.generator = StubModel()
+    elif model == "tiny":
+        gen.generator = tiny_model()
+    else:
+        gen.generator = None
+    if gen.generator is not None:
+        gen.model_name = model
+        gen.model_config = {"max_length": 256, "temperature": 0.8, "model_id": model}
+    else:
+        gen.model_name = "template"
+
+
+def _direct_target(model):
+    """Request function calling the generation path in-process"""
+    from generator import HTMLGenerator
+
+    gen = HTMLGenerator(load_models=False)
+    gen.trace_recorder = None
+    _install_model(gen, model)
+
+    def request(prompt):
+        _, backend, _ = gen._generate_html(prompt)
+        return backend
+    return request, gen
+
+
+def _apptest_target(model, disable_router=False):
+    """Request function running app.py headlessly, one AppTest per call"""
+    from streamlit.testing.v1 import AppTest
+
+    from generator import HTMLGenerator
+
+    # AppTest runs app.py in this process, so the generator it caches loads the offline model, not the hub ones
+    def load_offline(self):
+        _install_model(self, model)
+        if disable_router:
+            self.router.threshold = 2.0
+    HTMLGenerator._try_load_simple_model = load_offline
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+    def request(prompt):
+        at = AppTest.from_file(app_path, default_timeout=600).run()
+        at.text_area[0].input(prompt)
+        next(b for b in at.button if b.label.startswith("🚀")).click()
+        at.run()
+        if at.exception:
+            raise RuntimeError(str(at.exception[0].message))
+        return "app"
+    return request, None
+
+
+def run_load(sessions=10, duration=30.0, think_time=2.0, server_threads=None, mode="direct", model="none",
+             disable_router=False):
+    """Drive concurrent sessions for `duration` seconds and return the measurements"""
+    if mode == "apptest":
+        request, gen = _apptest_target(model, disable_router)
+    else:
+        request, gen = _direct_target(model)
+        if disable_router:
+            gen.router.threshold = 2.0
+
+    lock = threading.Lock()
+    latencies, queue_delays, backends = [], [], {}
+    errors = 0
+    rss_start = current_rss_mb()
+    rss_peak = rss_start
+    deadline = time.perf_counter() + duration
+    pool = ThreadPoolExecutor(max_workers=server_threads or sessions)
+
+    def serve(prompt, submitted):
+        # Time spent waiting for a free server thread is queueing delay
+        started = time.perf_counter()
+        backend = request(prompt)
+        return started - submitted, time.perf_counter() - started, backend
+
+    def session(seed):
+        nonlocal errors
+        rng = random.Random(seed)
+        while True:
+            time.sleep(rng.expovariate(1 / think_time) if think_time > 0 else 0)
+            if time.perf_counter() >= deadline:
+                return
+            submitted = time.perf_counter()
+            try:
+                queued, service, backend = pool.submit(serve, rng.choice(PROMPTS), submitted).result()
+            except Exception:
+                with lock:
+                    errors += 1
+                continue
+            with lock:
+                queue_delays.append(queued)
+                latencies.append(queued + service)
+                backends[backend] = backends.get(backend, 0) + 1
+
+    def watch_memory():
+        nonlocal rss_peak
+        while time.perf_counter() < deadline:
+            rss_peak = max(rss_peak, current_rss_mb())
+            time.sleep(0.5)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    threads.append(threading.Thread(target=watch_memory, daemon=True))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pool.shutdown(wait=True)
+    wall = time.perf_counter() - started
+
+    report = summarize(latencies, wall)
+    report.update({
+        "sessions": sessions,
+        "errors": errors,
+        "queue_p50": percentile(queue_delays, 50),
+        "queue_p95": percentile(queue_delays, 95),
+        "backends": backends,
+        "rss_start_mb": round(rss_start, 1),
+        "rss_peak_mb": round(rss_peak, 1),
+        "rss_growth_mb": round(current_rss_mb() - rss_start, 1),
+    })
+    return report
+
+
+def _print_report(report):
+    def ms(value):
+        return f"{value * 1000:.0f} ms" if value is not None else "-"
+
+    print(f"Sessions:       {report['sessions']}")
+    print(f"Requests:       {report['requests']} ({report['errors']} errors)")
+    print(f"Throughput:     {report['throughput'] or 0:.2f} req/s")
+    print(f"Latency:        p50 {ms(report['p50'])} · p95 {ms(report['p95'])} · p99 {ms(report['p99'])}")
+    print(f"Queueing delay: p50 {ms(report['queue_p50'])} · p95 {ms(report['queue_p95'])}")
+    print(f"Backends:       {report['backends']}")
+    print(f"Memory:         {report['rss_start_mb']} MB -> peak {report['rss_peak_mb']} MB "
+          f"(growth {report['rss_growth_mb']:+} MB)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate many concurrent app sessions")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10], help="concurrent sessions (several = sweep)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per run")
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean seconds between a session's requests")
+    parser.add_argument("--server-threads", type=int, default=None, help="requests served at once (default: one per session)")
+    parser.add_argument("--mode", choices=["direct", "apptest"], default="direct", help="call the generator or run app.py")
+    parser.add_argument("--model", choices=["none", "stub", "tiny"], default="stub", help="offline local model")
+    parser.add_argument("--mock-openai", action="store_true", help="route OpenAI calls to a local mock server")
+    parser.add_argument("--mock-latency", type=float, default=1.0, help="mean mock OpenAI latency in seconds")
+    parser.add_argument("--mock-error-rate", type=float, default=0.0, help="fraction of mock requests failing with 500")
+    parser.add_argument("--mock-rate-limit", type=float, default=0.0, help="fraction of mock requests failing with 429")
+    parser.add_argument("--no-router", action="store_true", help="send every prompt to the backends")
+    args = parser.parse_args()
+
+    mock = None
+    if args.mock_openai:
+        mock = MockOpenAIServer(args.mock_latency, args.mock_error_rate, args.mock_rate_limit).start()
+        # Read by HTMLGenerator when it is created
+        os.environ["OPENAI_API_KEY"] = "mock-key"
+        os.environ["OPENAI_BASE_URL"] = mock.url
+
+    try:
+        for count in args.sessions:
+            print(f"\n=== {count} sessions ===")
+            _print_report(run_load(count, args.duration, args.think_time, args.server_threads, args.mode,
+                                   args.model, args.no_router))
+    finally:
+        if mock is not None:
+            print(f"\nMock OpenAI requests: {mock.requests}")
+            mock.stop()
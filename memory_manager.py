@@ -0,0 +1,191 @@
+"""
+Idle model unloading and process memory budget for HTMLGenerator
+"""
+
+import gc
+import os
+import threading
+import time
+import weakref
+
+import model_store
+
+# Unload the model after this many idle seconds (0 keeps it resident forever)
+IDLE_TIMEOUT = float(os.getenv("MODEL_IDLE_TIMEOUT", "1800"))
+
+# Maximum process RSS in MB; loads and model generations that would exceed it use templates (0 = no limit)
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "0"))
+
+# Seconds before retrying a failed reload; doubles on each further failure up to RELOAD_RETRY_MAX
+RELOAD_RETRY_AFTER = float(os.getenv("MODEL_RELOAD_RETRY", "60"))
+RELOAD_RETRY_MAX = 3600
+
+# Rough size used when the store has no record of a model's weights
+DEFAULT_MODEL_MB = 550
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        # Peak rather than current RSS, but better than nothing (KB on Linux, bytes on macOS)
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return 0.0
+
+
+def estimated_model_mb(model_name):
+    """Expected memory cost of loading a model, from the store manifest when known"""
+    size = model_store.load_manifest().get(model_name, {}).get("size_bytes")
+    return size / (1024 * 1024) if size else DEFAULT_MODEL_MB
+
+
+def _release_memory():
+    """Collect garbage and hand freed heap pages back to the OS where possible"""
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class MemoryManager:
+    def __init__(self, owner, load_model=None, idle_timeout=IDLE_TIMEOUT, budget_mb=MEMORY_BUDGET_MB):
+        self._owner = weakref.ref(owner)
+        # load_model(model_config) -> generator; held weakly so it does not keep the owner alive
+        self._load_model = weakref.WeakMethod(load_model) if load_model is not None else None
+        self.idle_timeout = idle_timeout
+        self.budget_mb = budget_mb
+        self.last_used = time.time()
+        self.unloaded = False
+        self.reloading = False
+        self.retry_at = 0.0
+        self.failed_reloads = 0
+        self.unload_count = 0
+        self.reload_count = 0
+        self.refused_count = 0
+        self._lock = threading.Lock()
+
+        if self.idle_timeout > 0:
+            watcher = threading.Thread(target=self._watch_idle, name="model-idle-watcher", daemon=True)
+            watcher.start()
+
+    def touch(self):
+        """Record model activity so the idle timer starts over"""
+        self.last_used = time.time()
+
+    def allows_load(self, model_name):
+        """False if loading the model would push the process over the memory budget"""
+        if self.budget_mb <= 0:
+            return True
+        if current_rss_mb() + estimated_model_mb(model_name) > self.budget_mb:
+            self.refused_count += 1
+            return False
+        return True
+
+    def within_budget(self):
+        """False if the process is already over the memory budget"""
+        return self.budget_mb <= 0 or current_rss_mb() <= self.budget_mb
+
+    def unload(self):
+        """Drop the transformers pipeline and release its memory"""
+        owner = self._owner()
+        with self._lock:
+            if owner is None or owner.generator is None:
+                return False
+            owner.generator = None
+            self.unloaded = True
+            self.unload_count += 1
+        _release_memory()
+        return True
+
+    def reload_async(self):
+        """Start reloading an unloaded model in the background; True once it is loaded"""
+        with self._lock:
+            if not self.unloaded:
+                return True
+            if self.reloading or time.time() < self.retry_at:
+                return False
+            self.reloading = True
+
+        threading.Thread(target=self._reload, name="model-reload", daemon=True).start()
+        return False
+
+    def _reload(self):
+        """Reload the model chosen at startup and swap it in together with its config"""
+        loaded = False
+        try:
+            owner = self._owner()
+            load_model = self._load_model() if self._load_model is not None else None
+            model_config = getattr(owner, "model_config", None)
+            if owner is None or load_model is None or not model_config:
+                return
+            if not self.allows_load(model_config["name"]):
+                return
+
+            generator = load_model(model_config)
+            with self._lock:
+                owner.model_config = model_config
+                owner.model_name = model_config["model_id"]
+                owner.generator = generator
+                self.unloaded = False
+            loaded = True
+            self.reload_count += 1
+            self.touch()
+        except Exception:
+            # Templates keep serving; there is no script context here to report the error in
+            pass
+        finally:
+            with self._lock:
+                # A failed reload leaves the template path in charge until the backoff expires
+                if loaded:
+                    self.failed_reloads = 0
+                    self.retry_at = 0.0
+                else:
+                    self.failed_reloads += 1
+                    delay = min(RELOAD_RETRY_AFTER * 2 ** (self.failed_reloads - 1), RELOAD_RETRY_MAX)
+                    self.retry_at = time.time() + delay
+                self.reloading = False
+
+    def _watch_idle(self):
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while self._owner() is not None:
+            time.sleep(interval)
+            owner = self._owner()
+            if owner is None:
+                return
+            if owner.generator is not None and time.time() - self.last_used > self.idle_timeout:
+                self.unload()
+            del owner
+
+    def stats(self):
+        """Current memory use and unload/reload counters"""
+        owner = self._owner()
+        return {
+            "rss_mb": round(current_rss_mb(), 1),
+            "budget_mb": self.budget_mb or None,
+            "model_loaded": owner is not None and owner.generator is not None,
+            "idle_seconds": round(time.time() - self.last_used),
+            "idle_timeout": self.idle_timeout or None,
+            "reloading": self.reloading,
+            "unloads": self.unload_count,
+            "reloads": self.reload_count,
+            "failed_reloads": self.failed_reloads,
+            "refused_loads": self.refused_count,
+        }
@@ -0,0 +1,124 @@
+"""
+Parallel availability probing for the lightweight model candidates
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import model_store
+
+# Upper bound for probing all candidates; a hung hub request should not hold up startup
+PROBE_TIMEOUT = float(os.getenv("MODEL_PROBE_TIMEOUT", "30"))
+
+
+def _probe_one(model_name, store_dir=None):
+    """Check one candidate without loading its weights"""
+    started = time.perf_counter()
+    result = {"name": model_name, "ok": False, "source": None, "error": None}
+
+    try:
+        if model_store.is_known_unavailable(model_name, store_dir):
+            result["source"] = "manifest"
+            result["error"] = model_store.load_manifest(store_dir)[model_name].get("error") or "known unavailable"
+            return result
+
+        if model_store.has_snapshot(model_name, store_dir):
+            # A snapshot only needs a readable config to be usable
+            path = model_store.snapshot_path(model_name, store_dir)
+            with open(os.path.join(path, "config.json"), "r", encoding="utf-8") as f:
+                json.load(f)
+            result["ok"] = True
+            result["source"] = "store"
+            return result
+
+        if model_store.OFFLINE:
+            result["error"] = "no local snapshot (offline mode)"
+            return result
+
+        from transformers import AutoConfig, AutoTokenizer
+
+        try:
+            from huggingface_hub import try_to_load_from_cache
+            cached = isinstance(try_to_load_from_cache(model_name, "config.json"), str)
+        except ImportError:
+            cached = False
+
+        # Config and tokenizer are a few hundred KB at most - a cheap stand-in for a full load
+        AutoConfig.from_pretrained(model_name)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if not tokenizer("<!DOCTYPE html>")["input_ids"]:
+            raise ValueError("tokenizer produced no tokens")
+
+        result["ok"] = True
+        result["source"] = "cache" if cached else "hub"
+        return result
+
+    except ImportError as e:
+        # Missing libraries say nothing about the model itself, so do not record it
+        result["error"] = str(e)
+        return result
+
+    except Exception as e:
+        result["error"] = str(e)
+        model_store.mark_unavailable(model_name, e, store_dir)
+        return result
+
+    finally:
+        result["elapsed"] = round(time.perf_counter() - started, 3)
+
+
+def probe_models(model_names, max_workers=None, store_dir=None):
+    """Probe all candidates at once and return {name: result} in the original order"""
+    if not model_names:
+        return {}
+
+    results = {}
+    deadline = time.monotonic() + PROBE_TIMEOUT
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(model_names), thread_name_prefix="model-probe")
+    try:
+        futures = {name: pool.submit(_probe_one, name, store_dir) for name in model_names}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                results[name] = {"name": name, "ok": False, "source": None,
+                                 "error": f"probe timed out after {PROBE_TIMEOUT:g}s"}
+            except Exception as e:
+                results[name] = {"name": name, "ok": False, "source": None, "error": f"probe failed: {e}"}
+    finally:
+        # A hung probe keeps its thread, but startup no longer waits for it
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    try:
+        for name, result in results.items():
+            model_store.update_manifest(name, store_dir, probe={
+                "ok": result["ok"],
+                "source": result["source"],
+                "elapsed": result.get("elapsed"),
+            })
+    except OSError:
+        pass
+
+    return results
+
+
+def choose_best(model_names, results):
+    """First candidate in preference order that passed its probe, or None"""
+    for name in model_names:
+        if results.get(name, {}).get("ok"):
+            return name
+    return None
+
+
+if __name__ == "__main__":
+    import sys
+
+    names = sys.argv[1:] or ["microsoft/DialoGPT-small", "distilgpt2", "gpt2"]
+    probe_results = probe_models(names)
+    for name in names:
+        r = probe_results[name]
+        status = "✅" if r["ok"] else "❌"
+        print(f"{status} {name} ({r['source']}, {r.get('elapsed', '?')}s) {r['error'] or ''}")
+    print(f"Best available: {choose_best(names, probe_results)}")
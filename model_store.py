@@ -0,0 +1,301 @@
+"""
+Local model store: safetensors snapshots loaded through memory mapping
+"""
+
+import contextlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the in-process lock guards the manifest
+    fcntl = None
+
+# Where snapshots and the manifest live (override with MODEL_STORE_DIR)
+STORE_DIR = os.getenv("MODEL_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_store"))
+
+# Never contact the Hugging Face hub when set to 1
+OFFLINE = os.getenv("MODEL_STORE_OFFLINE", "0") == "1"
+
+# Seconds before a model that definitely failed (missing repo or file, corrupt config) is tried again
+RETRY_AFTER = int(os.getenv("MODEL_STORE_RETRY_AFTER", str(24 * 3600)))
+
+# Seconds before a model that failed for a passing reason (network, rate limit, timeout) is tried again
+TRANSIENT_RETRY_AFTER = int(os.getenv("MODEL_STORE_TRANSIENT_RETRY_AFTER", "300"))
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+WEIGHTS_NAME = "model.safetensors"
+
+_manifest_lock = threading.Lock()
+
+# safetensors dtype names -> torch dtype attribute names
+_SAFETENSORS_DTYPES = {
+    "F64": "float64",
+    "F32": "float32",
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "I64": "int64",
+    "I32": "int32",
+    "I16": "int16",
+    "I8": "int8",
+    "U8": "uint8",
+    "BOOL": "bool",
+}
+
+# Failures that will not clear up on their own
+_PERMANENT_ERRORS = {
+    "RepositoryNotFoundError", "RevisionNotFoundError", "EntryNotFoundError", "GatedRepoError",
+    "JSONDecodeError", "SafetensorError",
+}
+_PERMANENT_MESSAGES = (
+    "not a valid model identifier", "does not appear to have a file named", "repository not found",
+    "unrecognized model", "404 client error",
+)
+
+# Network trouble and rate limits; checked first because hub errors wrap them (e.g. LocalEntryNotFoundError)
+_TRANSIENT_ERRORS = {
+    "LocalEntryNotFoundError", "OfflineModeIsEnabled", "ConnectionError", "Timeout", "ConnectTimeout",
+    "ReadTimeout", "TimeoutError",
+}
+_TRANSIENT_MESSAGES = (
+    "429", "rate limit", "too many requests", "couldn't connect", "could not connect", "timed out",
+    "connection", "name resolution", "temporarily", "502", "503", "504",
+)
+
+
+def snapshot_path(model_name, store_dir=None):
+    """Directory holding the snapshot of a hub model"""
+    return os.path.join(store_dir or STORE_DIR, model_name.replace("/", "--"))
+
+
+def _manifest_path(store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, MANIFEST_NAME)
+
+
+@contextlib.contextmanager
+def _manifest_locked(store_dir=None):
+    """Hold the manifest lock across threads and, through a sidecar lock file, across processes"""
+    with _manifest_lock:
+        os.makedirs(store_dir or STORE_DIR, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(_manifest_path(store_dir) + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_manifest(store_dir=None):
+    """Read the manifest, returning an empty one if it does not exist yet"""
+    try:
+        with open(_manifest_path(store_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_manifest(model_name, store_dir=None, **fields):
+    """Merge fields into the manifest entry of a model and write it atomically"""
+    with _manifest_locked(store_dir):
+        manifest = load_manifest(store_dir)
+        entry = manifest.get(model_name, {})
+        entry.update(fields)
+        entry["updated"] = time.time()
+        manifest[model_name] = entry
+
+        path = _manifest_path(store_dir)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        return entry
+
+
+def is_permanent_error(error):
+    """True if the error says the model itself is broken or missing, not that the hub was unreachable"""
+    names, messages = set(), []
+    while error is not None and len(messages) < 10:
+        names.add(type(error).__name__)
+        messages.append(str(error).lower())
+        error = (error.__cause__ or error.__context__) if isinstance(error, BaseException) else None
+    text = " ".join(messages)
+
+    if names & _TRANSIENT_ERRORS or any(marker in text for marker in _TRANSIENT_MESSAGES):
+        return False
+    # Anything unrecognised gets the short retry window rather than a day off
+    return bool(names & _PERMANENT_ERRORS) or any(marker in text for marker in _PERMANENT_MESSAGES)
+
+
+def mark_unavailable(model_name, error, store_dir=None):
+    """Remember that a model could not be loaded so later starts skip it for a while"""
+    try:
+        return update_manifest(model_name, store_dir, status="unavailable", error=str(error)[:500],
+                               permanent=is_permanent_error(error))
+    except OSError:
+        # A read-only store only costs us the skip on the next start
+        return None
+
+
+def is_known_unavailable(model_name, store_dir=None):
+    """True if the model failed recently and has no local snapshot to fall back on"""
+    if has_snapshot(model_name, store_dir):
+        return False
+    entry = load_manifest(store_dir).get(model_name)
+    if not entry or entry.get("status") != "unavailable":
+        return False
+    retry_after = RETRY_AFTER if entry.get("permanent") else TRANSIENT_RETRY_AFTER
+    return time.time() - entry.get("updated", 0) < retry_after
+
+
+def has_snapshot(model_name, store_dir=None):
+    """True if a complete safetensors snapshot exists locally"""
+    path = snapshot_path(model_name, store_dir)
+    return (os.path.isfile(os.path.join(path, WEIGHTS_NAME))
+            and os.path.isfile(os.path.join(path, "config.json")))
+
+
+def save_snapshot(model_name, model, tokenizer, store_dir=None):
+    """Write an already loaded model and tokenizer to the store as safetensors"""
+    path = snapshot_path(model_name, store_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    model.save_pretrained(tmp_path, safe_serialization=True)
+    tokenizer.save_pretrained(tmp_path)
+
+    # Swap the finished snapshot into place so readers never see a partial one
+    if os.path.isdir(path):
+        old_path = f"{path}.{os.getpid()}.old"
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        _remove_tree(old_path)
+    else:
+        os.replace(tmp_path, path)
+
+    size = os.path.getsize(os.path.join(path, WEIGHTS_NAME)) if has_snapshot(model_name, store_dir) else 0
+    update_manifest(model_name, store_dir, status="available", path=path, size_bytes=size, error=None)
+    return path
+
+
+def snapshot_model(model_name, store_dir=None):
+    """Download a hub model once and store it as a safetensors snapshot"""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    try:
+        model = AutoModelForCausalLM.from_pretrained(model_name, low_cpu_mem_usage=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:
+        mark_unavailable(model_name, e, store_dir)
+        raise
+    return save_snapshot(model_name, model, tokenizer, store_dir)
+
+
+def _remove_tree(path):
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            os.remove(os.path.join(root, name))
+        for name in dirs:
+            os.rmdir(os.path.join(root, name))
+    os.rmdir(path)
+
+
+def _mmap_state_dict(weights_path):
+    """Map a safetensors file and build tensors that point straight into the mapping.
+
+    The mapping is copy-on-write, so every process loading the same snapshot
+    shares the physical pages until (and unless) a tensor is written to.
+    """
+    import torch
+
+    with open(weights_path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, _SAFETENSORS_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        if end == begin:
+            tensor = torch.empty(info["shape"], dtype=dtype)
+        else:
+            tensor = torch.frombuffer(mapping, dtype=dtype, count=(end - begin) // dtype.itemsize,
+                                      offset=data_start + begin).view(info["shape"])
+        state_dict[name] = tensor
+    return state_dict
+
+
+def _load_mmap_model(path):
+    """Build the model skeleton on CPU without initializing weights, then assign the mapped tensors.
+
+    The skeleton's parameters are never written to, so they cost address space but no
+    resident memory; non-persistent buffers (e.g. GPT2's attention masks) are created by
+    the model itself since the snapshot does not contain them.
+    """
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    try:
+        from transformers.modeling_utils import no_init_weights
+    except ImportError:
+        from contextlib import nullcontext as no_init_weights
+
+    config = AutoConfig.from_pretrained(path, local_files_only=True)
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(config)
+
+    state_dict = _mmap_state_dict(os.path.join(path, WEIGHTS_NAME))
+    result = model.load_state_dict(state_dict, strict=False, assign=True)
+    model.tie_weights()
+
+    # Tied weights (e.g. lm_head -> wte) are not saved separately; anything else missing would be garbage
+    mapped = {t.data_ptr() for t in state_dict.values()}
+    params = dict(model.named_parameters(remove_duplicate=False))
+    missing = [name for name in result.missing_keys if name in params and params[name].data_ptr() not in mapped]
+    if missing:
+        raise RuntimeError(f"snapshot does not cover {', '.join(missing[:5])}")
+    return model.eval()
+
+
+def load_pipeline(model_name, store_dir=None):
+    """Load a text-generation pipeline from the local snapshot, or None if there is none"""
+    if not has_snapshot(model_name, store_dir):
+        return None
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+    path = snapshot_path(model_name, store_dir)
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    try:
+        model = _load_mmap_model(path)
+    except Exception as e:
+        # Still loads from the snapshot, but into private memory that workers cannot share
+        logger.warning("Memory-mapped load of %s failed (%s); loading a private copy", model_name, e)
+        model = AutoModelForCausalLM.from_pretrained(path, local_files_only=True, low_cpu_mem_usage=True)
+    return pipeline("text-generation", model=model, tokenizer=tokenizer, device=-1)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python model_store.py snapshot distilgpt2 gpt2
+    if len(sys.argv) < 3 or sys.argv[1] != "snapshot":
+        print("Usage: python model_store.py snapshot <model name> [<model name> ...]")
+        sys.exit(1)
+
+    for name in sys.argv[2:]:
+        try:
+            print(f"✅ {name} -> {snapshot_model(name)}")
+        except Exception as e:
+            print(f"❌ {name}: {e}")
@@ -0,0 +1,185 @@
+"""
+Opt-in per-request profiling with collapsed-stack (flamegraph) and top-N exports
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Fraction of requests profiled without being asked to (0 = only on request)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+# "sample" (low-overhead stack sampling, flamegraph output) or "cprofile" (deterministic, .prof output)
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+
+# Milliseconds between stack samples
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+TOP_N = 20
+
+# Held while a cProfile run is enabled
+_cprofile_lock = threading.Lock()
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """Samples one thread's stack from a helper thread; the target runs at full speed"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+
+class RequestProfile:
+    def __init__(self, label, mode):
+        self.label = label
+        self.mode = mode
+        self.paths = {}
+        self.top = []
+        self.seconds = 0.0
+        self._started = None
+        self._profiler = None
+        self._sampler = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profiler = self._start_cprofile()
+            if self._profiler is None:
+                # Another request holds the process-wide profiler; sample this one instead
+                self.mode = "sample"
+        if self.mode != "cprofile":
+            self._sampler = _StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+            self._sampler.start()
+
+    @staticmethod
+    def _start_cprofile():
+        """An enabled cProfile.Profile, or None when one is already running in this process"""
+        # Since Python 3.12 cProfile uses sys.monitoring, so only one can be enabled at a time
+        if not _cprofile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Enabled by someone outside this module
+            _cprofile_lock.release()
+            return None
+        return profiler
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+            _cprofile_lock.release()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.seconds = time.perf_counter() - self._started
+        try:
+            self._write()
+        except OSError:
+            self.paths = {}
+
+    def _write(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-"
+                                         f"{re.sub(r'[^A-Za-z0-9_-]+', '_', self.label)[:40]}")
+
+        if self._profiler is not None:
+            self.paths["prof"] = base + ".prof"
+            self._profiler.dump_stats(self.paths["prof"])
+            stats = pstats.Stats(self._profiler)
+            # (function, own seconds, cumulative seconds) ordered by own time
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_N]
+            self.top = [(f"{func[2]} ({os.path.basename(func[0])}:{func[1]})", round(tt, 4), round(ct, 4))
+                        for func, (cc, nc, tt, ct, callers) in rows]
+            report = io.StringIO()
+            pstats.Stats(self._profiler, stream=report).sort_stats("cumulative").print_stats(TOP_N)
+            summary = report.getvalue()
+        else:
+            stacks = self._sampler.stacks
+            self.paths["folded"] = base + ".folded"
+            with open(self.paths["folded"], "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+            # Self time is where the stack ends; total time is any stack the function appears in.
+            # Samples are spread over the measured wall time, since sleeps overshoot the interval.
+            interval = self.seconds / max(1, sum(stacks.values()))
+            own, total = Counter(), Counter()
+            for stack, count in stacks.items():
+                frames = stack.split(";")
+                own[frames[-1]] += count
+                for name in set(frames):
+                    total[name] += count
+            self.top = [(name, round(count * interval, 4), round(total[name] * interval, 4))
+                        for name, count in own.most_common(TOP_N)]
+            summary = "\n".join(f"{own_s:>9.3f}s {total_s:>9.3f}s  {name}" for name, own_s, total_s in self.top)
+            summary = f"{'self':>10} {'total':>10}  function ({sum(stacks.values())} samples)\n" + summary
+
+        self.paths["top"] = base + ".top.txt"
+        with open(self.paths["top"], "w", encoding="utf-8") as f:
+            f.write(f"{self.label}: {self.seconds:.3f}s ({self.mode})\n\n{summary}\n")
+
+    def summary(self):
+        """Plain data for display: paths and (function, self seconds, total seconds) rows"""
+        return {
+            "label": self.label,
+            "mode": self.mode,
+            "seconds": round(self.seconds, 3),
+            "paths": dict(self.paths),
+            "top": list(self.top),
+        }
+
+
+@contextmanager
+def maybe_profile(label, force=None):
+    """Profile the block if forced ("sample"/"cprofile"/True) or picked by PROFILE_SAMPLE_RATE.
+
+    Yields the RequestProfile (files are written when the block exits) or None.
+    """
+    if force is True:
+        force = PROFILE_MODE
+    mode = force or (PROFILE_MODE if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE else None)
+    if mode not in ("sample", "cprofile"):
+        yield None
+        return
+
+    profile = RequestProfile(label, mode)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
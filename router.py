@@ -0,0 +1,126 @@
+"""
+Confidence-scored routing of prompts that a template already covers
+"""
+
+import os
+import re
+import threading
+
+from template_catalog import LAYOUT_WORDS, THEME_WORDS, _page_words
+
+# Prompts scoring at least this much skip the model entirely (set above 1 to disable routing)
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.75"))
+
+# Keywords per template, in matching priority order
+TEMPLATE_KEYWORDS = {
+    'calculator': ['calculator', 'calc', 'math', 'arithmetic', 'number'],
+    'todo': ['todo', 'task', 'list', 'checklist', 'reminder'],
+    'contact': ['contact', 'form', 'email', 'message', 'feedback'],
+}
+
+# Keywords that name the template outright rather than just hinting at it
+STRONG_KEYWORDS = {
+    'calculator': {'calculator', 'calc', 'arithmetic'},
+    'todo': {'todo', 'checklist'},
+    'contact': {'contact'},
+}
+
+# Words describing features the template already has
+TEMPLATE_FEATURES = {
+    'calculator': {'button', 'buttons', 'operation', 'operations', 'add', 'addition', 'subtract',
+                   'subtraction', 'multiply', 'multiplication', 'divide', 'division', 'decimal',
+                   'clear', 'display', 'numbers', 'digits', 'equals', 'maths'},
+    'todo': {'add', 'delete', 'remove', 'complete', 'completed', 'check', 'tasks', 'items', 'item',
+             'lists', 'todos', 'reminders', 'mark', 'done'},
+    'contact': {'name', 'email', 'phone', 'subject', 'message', 'messages', 'fields', 'field',
+                'submit', 'us', 'address', 'forms', 'input', 'inputs'},
+}
+
+# Words that carry no information about what the page should do
+STOP_WORDS = {
+    'a', 'an', 'the', 'for', 'with', 'and', 'or', 'of', 'to', 'in', 'on', 'my', 'me', 'i', 'that',
+    'this', 'is', 'it', 'app', 'application', 'web', 'webpage', 'page', 'site', 'website', 'html',
+    'create', 'make', 'build', 'design', 'generate', 'simple', 'basic', 'small', 'nice', 'modern',
+    'clean', 'beautiful', 'functionality', 'functional', 'feature', 'features', 'tool', 'please',
+    'want', 'need', 'some', 'which', 'can', 'has', 'have', 'should', 'using', 'containing',
+}
+
+
+# Words that only ask for a look the template catalog has a pre-rendered variant for
+VARIANT_WORDS = set().union(*THEME_WORDS.values(), *LAYOUT_WORDS.values()) | {
+    'theme', 'themed', 'mode', 'color', 'colors', 'colour', 'colours', 'colored', 'coloured', 'scheme', 'layout',
+}
+
+
+def _content_words(description):
+    normalized = description.lower().replace('to-do', 'todo').replace('to do', 'todo')
+    return [w for w in re.findall(r"[a-z0-9]+", normalized) if w not in STOP_WORDS]
+
+
+def score_description(description):
+    """Return (template_type, confidence) for the best matching template, or (None, 0.0)"""
+    words = _content_words(description)
+    if not words:
+        return None, 0.0
+
+    # Theme and layout words about the whole page (not "red buttons") are covered by a catalog variant
+    variant_words = VARIANT_WORDS & _page_words(description)
+
+    scores = {}
+    for template_type, keywords in TEMPLATE_KEYWORDS.items():
+        hits = {k for k in keywords if any(k in w for w in words)}
+        if not hits:
+            continue
+        keyword_score = 0.9 if hits & STRONG_KEYWORDS[template_type] else 0.6
+        keyword_score = min(1.0, keyword_score + 0.1 * (len(hits) - 1))
+
+        # Every word the template does not cover is something the user wants that it lacks
+        vocabulary = TEMPLATE_FEATURES[template_type]
+        covered = [w for w in words if w in vocabulary or w in variant_words or any(k in w for k in keywords)]
+        scores[template_type] = keyword_score * len(covered) / len(words)
+
+    if not scores:
+        return None, 0.0
+
+    best = max(scores, key=scores.get)
+    confidence = scores[best]
+    if len(scores) > 1:
+        # Prompts mixing several templates are rarely served well by any single one
+        confidence *= 0.5
+    return best, round(confidence, 3)
+
+
+class TemplateRouter:
+    def __init__(self, threshold=ROUTER_THRESHOLD):
+        self.threshold = threshold
+        self.routed = 0
+        self.model_calls = 0
+        self.model_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def route(self, description):
+        """Template type to serve directly, or None if the prompt needs the model"""
+        template_type, confidence = score_description(description)
+        if template_type is None or confidence < self.threshold:
+            return None
+        with self._lock:
+            self.routed += 1
+        return template_type
+
+    def record_model_time(self, seconds):
+        """Account for a generation that went through OpenAI or the local model"""
+        with self._lock:
+            self.model_calls += 1
+            self.model_seconds += seconds
+
+    def stats(self):
+        """Routing counters and the model time they are estimated to have saved"""
+        with self._lock:
+            avg_model_seconds = self.model_seconds / self.model_calls if self.model_calls else 0.0
+            return {
+                "threshold": self.threshold,
+                "routed": self.routed,
+                "model_calls": self.model_calls,
+                "avg_model_seconds": round(avg_model_seconds, 2),
+                "estimated_seconds_saved": round(self.routed * avg_model_seconds, 1),
+            }
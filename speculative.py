@@ -0,0 +1,121 @@
+"""
+Speculative (assisted) decoding: DistilGPT2 drafts tokens, GPT2 verifies them in batches
+"""
+
+import os
+import threading
+import time
+
+import model_store
+
+# "standard" loads one model from the fallback chain, "speculative" pairs GPT2 with a DistilGPT2 draft
+DECODING_MODE = os.getenv("DECODING_MODE", "standard")
+
+# Tokens the draft model proposes per verification round (transformers adapts it as it goes)
+DRAFT_TOKENS = int(os.getenv("SPECULATIVE_DRAFT_TOKENS", "5"))
+
+TARGET_MODEL = "gpt2"
+DRAFT_MODEL = "distilgpt2"
+
+
+def _load_causal_lm(model_name):
+    """(model, tokenizer) from the local store, snapshotting it on first use"""
+    pipe = model_store.load_pipeline(model_name)
+    if pipe is not None:
+        return pipe.model, pipe.tokenizer
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    model = AutoModelForCausalLM.from_pretrained(model_name, low_cpu_mem_usage=True).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    try:
+        model_store.save_snapshot(model_name, model, tokenizer)
+    except Exception:
+        pass
+    return model, tokenizer
+
+
+class SpeculativeGenerator:
+    """Callable with the same interface and output as a text-generation pipeline"""
+
+    def __init__(self, target_name=TARGET_MODEL, draft_name=DRAFT_MODEL, draft_tokens=DRAFT_TOKENS):
+        self.model, self.tokenizer = _load_causal_lm(target_name)
+        self.draft_model, _ = _load_causal_lm(draft_name)
+        self.draft_model.generation_config.num_assistant_tokens = draft_tokens
+
+        # Forward passes are counted per thread, so concurrent sessions do not mix up their stats
+        self._calls = threading.local()
+        self.model.register_forward_hook(lambda *_: self._count("target"))
+        self.draft_model.register_forward_hook(lambda *_: self._count("draft"))
+
+        self._lock = threading.Lock()
+        self.generations = 0
+        self.new_tokens = 0
+        self.drafted = 0
+        self.accepted = 0
+        self.seconds = 0.0
+
+    def _count(self, which):
+        setattr(self._calls, which, getattr(self._calls, which, 0) + 1)
+
+    def __call__(self, prompt, max_length=256, temperature=0.8, do_sample=True, pad_token_id=50256,
+                 truncation=True, num_return_sequences=1, max_new_tokens=None, **kwargs):
+        import torch
+
+        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=truncation,
+                                max_length=self.model.config.n_positions)
+        self._calls.target = 0
+        self._calls.draft = 0
+
+        started = time.perf_counter()
+        with torch.no_grad():
+            output = self.model.generate(
+                **inputs,
+                assistant_model=self.draft_model,
+                max_length=None if max_new_tokens else max_length,
+                max_new_tokens=max_new_tokens,
+                do_sample=do_sample,
+                temperature=temperature,
+                pad_token_id=pad_token_id,
+            )
+        elapsed = time.perf_counter() - started
+
+        new_tokens = output.shape[1] - inputs["input_ids"].shape[1]
+        # Every verification round yields one token of its own; the rest were accepted drafts
+        accepted = max(0, new_tokens - self._calls.target)
+        with self._lock:
+            self.generations += 1
+            self.new_tokens += new_tokens
+            self.drafted += self._calls.draft
+            self.accepted += min(accepted, self._calls.draft)
+            self.seconds += elapsed
+
+        return [{"generated_text": self.tokenizer.decode(output[0], skip_special_tokens=True)}]
+
+    def stats(self):
+        """Draft acceptance rate and decoding throughput so far"""
+        with self._lock:
+            return {
+                "generations": self.generations,
+                "new_tokens": self.new_tokens,
+                "acceptance_rate": round(self.accepted / self.drafted, 3) if self.drafted else None,
+                "tokens_per_sec": round(self.new_tokens / self.seconds, 1) if self.seconds else None,
+            }
+
+
+if __name__ == "__main__":
+    # Quick comparison of plain GPT2 decoding against speculative decoding
+    import torch
+
+    speculative = SpeculativeGenerator()
+    prompt = "<!DOCTYPE html>\n<html>\n<head>\n<title>Calculator</title>\n<style>\n"
+    inputs = speculative.tokenizer(prompt, return_tensors="pt")
+
+    started = time.perf_counter()
+    with torch.no_grad():
+        baseline = speculative.model.generate(**inputs, max_new_tokens=128, do_sample=False, pad_token_id=50256)
+    baseline_tps = (baseline.shape[1] - inputs["input_ids"].shape[1]) / (time.perf_counter() - started)
+
+    speculative(prompt, max_length=inputs["input_ids"].shape[1] + 128, do_sample=False)
+    print(f"GPT2 alone:        {baseline_tps:.1f} tokens/sec")
+    print(f"GPT2 + DistilGPT2: {speculative.stats()}")
@@ -0,0 +1,243 @@
+"""
+Pre-rendered catalog of template variants (themes x layouts), compressed and content-addressed
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+CATALOG_FILE = os.getenv("TEMPLATE_CATALOG_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "template_catalog.bin"))
+
+MAGIC = b"TPLCAT1\n"
+
+# Palette roles: gradient start/end, primary (+hover), accent (+hover), danger (+hover)
+THEMES = {
+    "default": None,
+    "ocean": {"gradient_start": "#2193b0", "gradient_end": "#6dd5ed", "primary": "#1b7f9c", "primary_hover": "#156a82",
+              "accent": "#20bf6b", "accent_hover": "#1aa35b", "danger": "#eb3b5a", "danger_hover": "#d63050"},
+    "sunset": {"gradient_start": "#ff7e5f", "gradient_end": "#feb47b", "primary": "#e8603c", "primary_hover": "#d14f2d",
+               "accent": "#f7b731", "accent_hover": "#e0a520", "danger": "#c0392b", "danger_hover": "#a93226"},
+    "forest": {"gradient_start": "#134e5e", "gradient_end": "#71b280", "primary": "#2d8659", "primary_hover": "#246e49",
+               "accent": "#8bc34a", "accent_hover": "#7cb342", "danger": "#d35400", "danger_hover": "#ba4a00"},
+    "midnight": {"gradient_start": "#0f2027", "gradient_end": "#2c5364", "primary": "#8e44ad", "primary_hover": "#7d3c98",
+                 "accent": "#16a085", "accent_hover": "#138d75", "danger": "#e74c3c", "danger_hover": "#cb4335",
+                 "extra_css": """
+        .calculator, .container, .form-container { background: #1f2933 !important; color: #e4e7eb; }
+        .display, input, textarea, .todo-item, .number, .operator { background: #323f4b !important; color: #e4e7eb !important; border-color: #52606d !important; }
+        h1, label, .todo-text { color: #e4e7eb !important; }"""},
+    "mono": {"gradient_start": "#bdc3c7", "gradient_end": "#2c3e50", "primary": "#2c3e50", "primary_hover": "#1a252f",
+             "accent": "#34495e", "accent_hover": "#2c3e50", "danger": "#7f8c8d", "danger_hover": "#6c7a7b"},
+}
+
+LAYOUTS = {
+    "default": "",
+    "compact": """
+        body { padding: 8px !important; font-size: 14px; }
+        .calculator, .container, .form-container { padding: 12px !important; max-width: 260px; }
+        .container { max-width: 420px !important; }
+        .form-container { max-width: 380px !important; }
+        button { height: auto; min-height: 40px; font-size: 15px !important; }
+        h1 { font-size: 22px !important; margin-bottom: 16px !important; }""",
+    "wide": """
+        .calculator { max-width: 420px !important; }
+        .container { max-width: 900px !important; }
+        .form-container { max-width: 760px !important; }
+        button { font-size: 20px !important; }""",
+}
+
+# Base colors of each template -> palette role they play
+_TEMPLATE_COLORS = {
+    "calculator": {"#667eea": "gradient_start", "#764ba2": "gradient_end", "#5a6fd8": "primary_hover",
+                   "#ff6b6b": "danger", "#ee5a5a": "danger_hover"},
+    "todo": {"#74b9ff": "gradient_start", "#0984e3": "primary", "#00b894": "accent", "#00a085": "accent_hover",
+             "#e17055": "danger", "#d63031": "danger_hover"},
+    "contact": {"#667eea": "gradient_start", "#764ba2": "gradient_end", "#5a6fd8": "primary_hover"},
+}
+
+# Description words that pick a theme or layout
+THEME_WORDS = {
+    "ocean": {"ocean", "blue", "sea", "water", "cool", "aqua"},
+    "sunset": {"sunset", "orange", "warm", "red", "peach", "summer"},
+    "forest": {"forest", "green", "nature", "eco", "leaf"},
+    "midnight": {"dark", "night", "midnight", "black"},
+    "mono": {"mono", "monochrome", "grayscale", "greyscale", "minimal", "minimalist", "gray", "grey"},
+}
+LAYOUT_WORDS = {
+    "compact": {"compact", "small", "mini", "tiny", "mobile"},
+    "wide": {"wide", "large", "big", "full", "fullscreen", "desktop"},
+}
+
+# Parts of a page; "red delete button" or "buttons in big font" style the part, not the whole page
+ELEMENT_WORDS = {
+    "button", "buttons", "text", "font", "fonts", "border", "borders", "link", "links", "header", "heading",
+    "headings", "title", "icon", "icons", "label", "labels", "input", "inputs", "field", "fields", "display",
+    "checkbox", "checkboxes", "key", "keys", "badge", "badges", "highlight", "highlights", "accent", "accents",
+}
+
+
+def _page_words(description):
+    """Description words, minus the ones within two words of a page element"""
+    tokens = re.findall(r"[a-z]+", description.lower())
+    return {
+        word for i, word in enumerate(tokens)
+        if not ELEMENT_WORDS & set(tokens[max(0, i - 2):i] + tokens[i + 1:i + 3])
+    }
+
+
+def choose_variant(description):
+    """(theme, layout) matching words about the whole page, defaults otherwise"""
+    words = _page_words(description)
+    theme = next((name for name, keys in THEME_WORDS.items() if keys & words), "default")
+    layout = next((name for name, keys in LAYOUT_WORDS.items() if keys & words), "default")
+    return theme, layout
+
+
+def render_variant(template_type, template, theme, layout):
+    """Apply a theme's palette and a layout's overrides to a base template"""
+    palette = THEMES[theme]
+    html = template
+    if palette:
+        colors = _TEMPLATE_COLORS.get(template_type, {})
+        pattern = re.compile("|".join(re.escape(c) for c in colors), re.IGNORECASE) if colors else None
+        if pattern:
+            html = pattern.sub(lambda m: palette[colors[m.group(0).lower()]], html)
+    extra = (palette or {}).get("extra_css", "") + LAYOUTS[layout]
+    if extra:
+        html = html.replace("</style>", extra.rstrip() + "\n    </style>", 1)
+    return html
+
+
+def _source_digest(templates):
+    data = json.dumps({"templates": templates, "themes": THEMES, "layouts": LAYOUTS}, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def build_catalog(templates, path=CATALOG_FILE):
+    """Render every (template, theme, layout) variant and write the catalog; returns its bytes"""
+    entries, blobs, order = {}, {}, []
+    for template_type, template in templates.items():
+        for theme in THEMES:
+            for layout in LAYOUTS:
+                html = render_variant(template_type, template, theme, layout).encode("utf-8")
+                digest = hashlib.sha256(html).hexdigest()
+                entries[f"{template_type}/{theme}/{layout}"] = digest
+                # Identical renders (e.g. a theme that does not touch a template) are stored once
+                if digest not in blobs:
+                    blobs[digest] = zlib.compress(html, 9)
+                    order.append(digest)
+
+    offsets, position = {}, 0
+    for digest in order:
+        offsets[digest] = [position, len(blobs[digest])]
+        position += len(blobs[digest])
+
+    index = json.dumps({"source": _source_digest(templates), "entries": entries, "blobs": offsets}).encode("utf-8")
+    data = MAGIC + struct.pack("<Q", len(index)) + index + b"".join(blobs[d] for d in order)
+
+    if path:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return data
+
+
+class TemplateCatalog:
+    """Lazily opened catalog; get() is a dict lookup plus one cached decompression"""
+
+    def __init__(self, templates, path=CATALOG_FILE):
+        self.templates = templates
+        self.path = path
+        self._index = None
+        self._data = None
+        self._lock = threading.Lock()
+        # Decompressed variants, least recently used first; per instance so catalogs can be collected
+        self._blobs = OrderedDict()
+        self._blob_cache_size = 64
+
+    def _load(self):
+        with self._lock:
+            if self._index is not None:
+                return
+            data = None
+            try:
+                with open(self.path, "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass
+
+            index = self._parse(data) if data is not None else None
+            if index is None or index.get("source") != _source_digest(self.templates):
+                # Missing or built from different templates: rebuild (in memory if the file is not writable)
+                try:
+                    data = build_catalog(self.templates, self.path)
+                except OSError:
+                    data = build_catalog(self.templates, None)
+                index = self._parse(data)
+
+            self._data = data
+            self._blob_start = len(MAGIC) + 8 + struct.unpack("<Q", data[len(MAGIC):len(MAGIC) + 8])[0]
+            self._index = index
+
+    @staticmethod
+    def _parse(data):
+        if data[:len(MAGIC)] != MAGIC:
+            return None
+        index_size = struct.unpack("<Q", data[len(MAGIC):len(MAGIC) + 8])[0]
+        try:
+            return json.loads(bytes(data[len(MAGIC) + 8:len(MAGIC) + 8 + index_size]))
+        except ValueError:
+            return None
+
+    def get(self, template_type, theme="default", layout="default"):
+        """Pre-rendered variant, or None if the catalog has no such combination"""
+        if self._index is None:
+            self._load()
+        digest = self._index["entries"].get(f"{template_type}/{theme}/{layout}")
+        if digest is None:
+            return None
+        return self._blob(digest)
+
+    def _blob(self, digest):
+        with self._lock:
+            if digest in self._blobs:
+                self._blobs.move_to_end(digest)
+                return self._blobs[digest]
+
+        offset, length = self._index["blobs"][digest]
+        start = self._blob_start + offset
+        html = zlib.decompress(self._data[start:start + length]).decode("utf-8")
+        with self._lock:
+            self._blobs[digest] = html
+            while len(self._blobs) > self._blob_cache_size:
+                self._blobs.popitem(last=False)
+        return html
+
+    def variants(self):
+        if self._index is None:
+            self._load()
+        return sorted(self._index["entries"])
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python template_catalog.py build
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Usage: python template_catalog.py build")
+        sys.exit(1)
+
+    from generator import HTMLGenerator
+
+    base_templates = HTMLGenerator(load_models=False).templates
+    catalog_bytes = build_catalog(base_templates)
+    index_info = TemplateCatalog._parse(catalog_bytes)
+    raw = sum(len(render_variant(t, base_templates[t], th, la)) for t in base_templates for th in THEMES for la in LAYOUTS)
+    print(f"✅ {len(index_info['entries'])} variants ({len(index_info['blobs'])} unique) -> {CATALOG_FILE}")
+    print(f"   {raw / 1024:.0f} KB rendered, {len(catalog_bytes) / 1024:.0f} KB in the catalog")
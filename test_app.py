@@ -0,0 +1,49 @@
+"""
+Headless tests of the Streamlit app
+"""
+
+import os
+
+import pytest
+
+from generator import HTMLGenerator
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    # Template generation only: no hub models in tests
+    monkeypatch.setattr(HTMLGenerator, "_try_load_simple_model", lambda self: setattr(self, "model_name", "template"))
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    return AppTest.from_file(APP, default_timeout=120).run()
+
+
+def _generate(at, prompt):
+    at.text_area[0].input(prompt)
+    next(b for b in at.button if b.label.startswith("🚀")).click()
+    at.run()
+    assert not at.exception
+
+
+def test_history_selector_follows_the_page_shown(app):
+    _generate(app, "simple calculator")
+    _generate(app, "todo list")
+    _generate(app, "contact form")
+    selector = app.selectbox(key="history_choice")
+    assert selector.value == app.session_state.history_digest
+    assert len(selector.options) == 3
+
+    # Restore the oldest result, then generate again: the selector shows the new page
+    selector.select(selector.options[-1]).run()
+    assert "Calculator" in app.session_state.generated_html
+    _generate(app, "simple todo app with tasks")
+    assert app.selectbox(key="history_choice").value == app.session_state.history_digest
+
+    # Edits change the page below the selector; it follows them too
+    app.text_input(key="edit_instruction").input("make the buttons blue").run()
+    next(b for b in app.button if b.label == "Apply Edit").click().run()
+    assert not app.exception
+    assert app.selectbox(key="history_choice").value == app.session_state.history_digest
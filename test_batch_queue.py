@@ -0,0 +1,51 @@
+"""
+Tests for the durable batch job queue
+"""
+
+import os
+import time
+
+from batch_queue import JobQueue, run_queue
+from load_test import MockOpenAIServer
+
+
+def _status(queue, job_id):
+    return queue._conn().execute("SELECT status, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_rate_limits_do_not_use_up_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=2)
+    queue.submit(["calculator"])
+    for _ in range(5):
+        job_id, _ = queue.claim()
+        queue.requeue(job_id, "429 rate limited", delay=0)
+    assert _status(queue, job_id) == ("pending", 0)
+
+    job_id, _ = queue.claim()
+    queue.fail(job_id, "HTTP 500", retry_after=0)
+    job_id, _ = queue.claim()
+    queue.fail(job_id, "HTTP 500", retry_after=0)
+    assert _status(queue, job_id) == ("failed", 2)
+
+
+def test_recover_only_takes_back_expired_leases(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    queue.submit(["first", "second"])
+    live, _ = queue.claim()
+    dead, _ = queue.claim()
+    queue._conn().execute("UPDATE jobs SET updated = ? WHERE id = ?", (time.time() - 3600, dead))
+
+    assert queue.recover(stale_after=300) == 1
+    assert _status(queue, live)[0] == "running"
+    assert _status(queue, dead)[0] == "pending"
+
+
+def test_run_finishes_every_job_despite_rate_limits(tmp_path):
+    with MockOpenAIServer(latency=0.01, rate_limit_rate=0.3) as mock:
+        queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=1)
+        batch = queue.submit([f"Test page {i}" for i in range(12)])
+        counts = run_queue(queue, base_url=mock.url, api_key="mock-key", concurrency=4)
+
+    assert counts == {"done": 12}
+    assert queue.export(str(tmp_path / "out"), batch) == 12
+    assert len(os.listdir(tmp_path / "out")) == 12
@@ -0,0 +1,68 @@
+"""
+Tests for download artifacts and minification
+"""
+
+import gzip
+
+import delivery
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <!-- page styles -->
+    <style>
+        /* buttons */
+        a :hover { color: red; }
+        button:hover {
+            background: #0984e3;
+        }
+    </style>
+</head>
+<body>
+    <pre>  keep   this
+    spacing</pre>
+    <textarea>  and   this  </textarea>
+    <script>
+        const label = `line one
+            line two`;
+        let total = 1
+        total += 2
+    </script>
+</body>
+</html>
+"""
+
+
+def test_minify_keeps_raw_blocks_and_selectors():
+    html = delivery.minify_html(PAGE)
+    assert "<!--" not in html and "/* buttons */" not in html
+    assert "<pre>  keep   this\n    spacing</pre>" in html
+    assert "<textarea>  and   this  </textarea>" in html
+    # Descendant ":hover" is a different selector from "a:hover"
+    assert "a :hover{color:red}" in html
+    assert "button:hover{background:#0984e3}" in html
+    # Template literal indentation and ASI-sensitive newlines survive
+    assert "`line one\n            line two`" in html
+    assert "let total = 1\n" in html
+    assert len(html) < len(PAGE)
+
+
+def test_minify_without_template_literals_strips_indentation():
+    html = delivery.minify_html("<script>\n    let a = 1\n    a++\n</script>")
+    assert html == "<script>let a = 1\na++</script>"
+
+
+def test_artifacts_are_reused_and_reproducible():
+    first = delivery.prepare_artifact(PAGE, compress=True)
+    assert delivery.prepare_artifact(PAGE, compress=True) is first
+    assert first.file_name.endswith(".html.gz") and first.mime == "application/gzip"
+    assert gzip.decompress(first.data).decode("utf-8") == PAGE
+
+    # Byte-identical gzip output for the same page, so downloads hash the same
+    assert delivery.Artifact(PAGE, compress=True).data == first.data
+
+
+def test_code_preview_truncates_on_a_line_break():
+    source, truncated = delivery.code_preview(PAGE, limit=40)
+    assert truncated and PAGE.startswith(source) and len(source) <= 40
+    assert delivery.code_preview(PAGE) == (PAGE, False)
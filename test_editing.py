@@ -0,0 +1,69 @@
+"""
+Tests for picking and patching the section of a page an edit targets
+"""
+
+import pytest
+
+import editing
+
+
+@pytest.mark.parametrize("template_type, instruction, kind, name", [
+    ("calculator", "make the buttons blue", "style", "<style>"),
+    ("todo", "save the tasks in localstorage", "script", "<script>"),
+    ("calculator", "add a square root button", "element", "<div.buttons>"),
+    ("todo", "change the title to Groceries", "element", "<h1>"),
+    ("contact", "rename the heading to Get in touch", "element", "<h1>"),
+    ("contact", "add a paragraph about opening hours", "body", "<body>"),
+])
+def test_section_picker(templates, template_type, instruction, kind, name):
+    html = templates[template_type]
+    section = editing.find_section(html, instruction)
+    assert (section.kind, section.name) == (kind, name)
+    if name == "<h1>":
+        assert section.text(html).startswith("<h1>") and section.text(html).endswith("</h1>")
+
+
+def test_color_rule_targets_the_named_element(templates):
+    html = templates["calculator"]
+    section = editing.find_section(html, "make the buttons blue")
+    patch = editing.rule_based_patch(html, section, "make the buttons blue")
+    assert "button { background: blue !important; }" in patch
+    assert editing.patch_is_valid(section, patch)
+
+    edited = editing.splice(html, section, patch)
+    assert edited.startswith(html[:section.start]) and edited.endswith(html[section.end:])
+
+
+def test_dark_mode_rule(templates):
+    html = templates["todo"]
+    section = editing.find_section(html, "switch to a dark theme")
+    assert "#1e1e2e" in editing.rule_based_patch(html, section, "switch to a dark theme")
+
+
+def test_elements_without_a_generic_selector_go_to_the_model(templates):
+    html = templates["todo"]
+    for instruction in ("make the todo items rounded", "make the todo items red"):
+        section = editing.find_section(html, instruction)
+        assert section.kind == "style"
+        assert editing.rule_based_patch(html, section, instruction) is None
+
+
+def test_rules_only_edit_styles(templates):
+    html = templates["todo"]
+    section = editing.find_section(html, "change the title to Groceries")
+    assert editing.rule_based_patch(html, section, "change the title to Groceries") is None
+
+
+def test_patch_validation():
+    element = editing.Section("element", 0, 10, "<div.buttons>")
+    assert editing.patch_is_valid(element, "<div class='buttons'><button>1</button></div>")
+    assert not editing.patch_is_valid(element, "<div class='buttons'><button>1</div>")
+    assert not editing.patch_is_valid(element, "<!DOCTYPE html><html><body><div></div></body></html>")
+
+    style = editing.Section("style", 0, 10, "<style>")
+    assert editing.patch_is_valid(style, "button { color: red; }")
+    assert not editing.patch_is_valid(style, "button { color: red; </style>")
+
+
+def test_extract_patch_strips_fences():
+    assert editing.extract_patch("Here you go:\n```html\n<h1>Hi</h1>\n```\nDone") == "<h1>Hi</h1>"
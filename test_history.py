@@ -0,0 +1,48 @@
+"""
+Tests for the compressed generation history
+"""
+
+from history import HistoryStore
+
+PAGE = "<!DOCTYPE html><html><body><h1>Calculator</h1>" + "<button>1</button>" * 200 + "</body></html>"
+
+
+def test_same_page_from_another_prompt_is_one_entry():
+    store = HistoryStore()
+    first = store.add("s1", "simple calculator", PAGE)
+    store.add("s1", "todo list", PAGE.replace("Calculator", "Todo"))
+    second = store.add("s1", "simple calculator app", PAGE)
+
+    assert first == second
+    entries = store.entries("s1")
+    digests = [e["digest"] for e in entries]
+    assert len(digests) == len(set(digests)) == 2
+    assert entries[0]["prompt"] == "simple calculator app"
+    assert store.get("s1", first) == PAGE
+
+
+def test_identical_pages_are_stored_once_across_sessions():
+    store = HistoryStore()
+    store.add("s1", "calculator", PAGE)
+    store.add("s2", "calculator", PAGE)
+    stats = store.stats()
+    assert stats["entries"] == 2 and stats["unique_pages"] == 1
+    assert stats["stored_kb"] < stats["original_kb"]
+
+
+def test_session_keeps_newest_entries():
+    store = HistoryStore(session_max_entries=3)
+    digests = [store.add("s1", f"page {i}", PAGE.replace("Calculator", f"Page {i}")) for i in range(5)]
+
+    assert [e["digest"] for e in store.entries("s1")] == digests[:1:-1]
+    assert store.get("s1", digests[0]) is None
+    assert store.stats()["unique_pages"] == 3
+
+
+def test_global_cap_evicts_least_recently_used_session():
+    store = HistoryStore(global_max_bytes=1)
+    store.add("old", "a", PAGE)
+    store.add("new", "b", PAGE.replace("Calculator", "Other"))
+
+    assert store.entries("old") == []
+    assert store.stats()["sessions"] <= 1
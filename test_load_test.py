@@ -0,0 +1,56 @@
+"""
+Tests for the load-testing harness and its mock OpenAI server
+"""
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import load_test
+from generator import HTMLGenerator
+
+
+def _post(url):
+    request = urllib.request.Request(url + "/chat/completions", method="POST",
+                                     data=json.dumps({"messages": [{"role": "user", "content": "calculator"}]}).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_run_load_with_stub_model():
+    report = load_test.run_load(sessions=2, duration=1, think_time=0.05, model="stub")
+    assert report["sessions"] == 2
+    assert report["requests"] > 0 and report["errors"] == 0
+    assert sum(report["backends"].values()) == report["requests"]
+    assert report["p50"] is not None and report["queue_p50"] is not None
+
+
+def test_mock_server_replies_and_injects_failures():
+    with load_test.MockOpenAIServer(latency=0, page_size=10) as mock:
+        reply = _post(mock.url)
+        assert reply["choices"][0]["message"]["content"].startswith("<!DOCTYPE html>")
+
+    with load_test.MockOpenAIServer(latency=0, rate_limit_rate=1.0) as mock:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _post(mock.url)
+        assert error.value.code == 429
+        assert error.value.headers["Retry-After"] == "1"
+
+    with load_test.MockOpenAIServer(latency=0, error_rate=1.0) as mock:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _post(mock.url)
+        assert error.value.code == 500
+        assert mock.requests == 1
+
+
+def test_apptest_generator_honours_no_router(monkeypatch):
+    # _apptest_target patches the class; register the original so it is restored afterwards
+    monkeypatch.setattr(HTMLGenerator, "_try_load_simple_model", HTMLGenerator._try_load_simple_model)
+    load_test._apptest_target("stub", disable_router=True)
+
+    gen = HTMLGenerator()
+    assert isinstance(gen.generator, load_test.StubModel)
+    assert gen.router.route("simple calculator") is None
@@ -0,0 +1,81 @@
+"""
+Tests for idle unloading and background reloading
+"""
+
+import gc
+import time
+import weakref
+
+import memory_manager
+from memory_manager import MemoryManager
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.model_config = {"name": "distilgpt2", "model_id": "distilgpt2"}
+        self.model_name = "distilgpt2"
+        self.loads = []
+        self.generator = object()
+        self.memory = MemoryManager(self, load_model=self.load, idle_timeout=0, budget_mb=0)
+
+    def load(self, model_config):
+        self.loads.append(model_config)
+        return "reloaded pipeline"
+
+
+def _wait_for_reload(memory):
+    deadline = time.time() + 5
+    while memory.reloading and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_reload_uses_the_chosen_model():
+    owner = FakeGenerator()
+    assert owner.memory.unload()
+    assert owner.generator is None and owner.memory.unloaded
+
+    assert owner.memory.reload_async() is False
+    _wait_for_reload(owner.memory)
+
+    assert owner.loads == [{"name": "distilgpt2", "model_id": "distilgpt2"}]
+    assert owner.generator == "reloaded pipeline"
+    assert owner.model_name == "distilgpt2"
+    assert owner.memory.stats()["reloads"] == 1
+    assert owner.memory.reload_async() is True
+
+
+def test_failed_reload_leaves_templates_in_charge(monkeypatch):
+    monkeypatch.setattr(memory_manager, "RELOAD_RETRY_AFTER", 0.2)
+    owner = FakeGenerator()
+
+    def broken(model_config):
+        raise OSError("snapshot missing")
+
+    owner.memory._load_model = lambda: broken
+    owner.memory.unload()
+    owner.memory.reload_async()
+    _wait_for_reload(owner.memory)
+
+    assert owner.generator is None
+    assert owner.memory.unloaded and not owner.memory.reloading
+    assert owner.memory.stats()["failed_reloads"] == 1
+
+    # Requests inside the backoff keep using templates without starting another load
+    owner.memory._load_model = lambda: owner.load
+    assert owner.memory.reload_async() is False
+    assert not owner.memory.reloading and owner.loads == []
+
+    time.sleep(0.25)
+    owner.memory.reload_async()
+    _wait_for_reload(owner.memory)
+    assert owner.generator == "reloaded pipeline"
+    assert not owner.memory.unloaded
+    assert owner.memory.stats()["failed_reloads"] == 0
+
+
+def test_manager_does_not_keep_its_owner_alive():
+    owner = FakeGenerator()
+    ref = weakref.ref(owner)
+    del owner
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,42 @@
+"""
+Tests for parallel model probing
+"""
+
+import time
+
+import pytest
+
+import model_probe
+import model_store
+
+
+def test_hung_probe_does_not_block_startup(tmp_path, monkeypatch):
+    def probe(name, store_dir=None):
+        if name == "hung":
+            time.sleep(3)
+        return {"name": name, "ok": True, "source": "store", "error": None}
+
+    monkeypatch.setattr(model_probe, "_probe_one", probe)
+    monkeypatch.setattr(model_probe, "PROBE_TIMEOUT", 0.3)
+
+    started = time.monotonic()
+    results = model_probe.probe_models(["fast", "hung"], store_dir=str(tmp_path))
+    assert time.monotonic() - started < 2
+    assert results["fast"]["ok"]
+    assert not results["hung"]["ok"] and "timed out" in results["hung"]["error"]
+
+
+def test_offline_probe_is_not_remembered_for_a_day(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store, "OFFLINE", False)
+    monkeypatch.setattr(model_store, "TRANSIENT_RETRY_AFTER", 0)
+
+    def offline(*args, **kwargs):
+        raise OSError("We couldn't connect to 'https://huggingface.co' to load the files")
+
+    transformers = pytest.importorskip("transformers")
+    monkeypatch.setattr(transformers.AutoConfig, "from_pretrained", offline)
+
+    result = model_probe.probe_models(["distilgpt2"], store_dir=str(tmp_path))["distilgpt2"]
+    assert not result["ok"]
+    assert model_store.load_manifest(str(tmp_path))["distilgpt2"]["permanent"] is False
+    assert not model_store.is_known_unavailable("distilgpt2", str(tmp_path))
@@ -0,0 +1,107 @@
+"""
+Tests for the memory-mapped model store
+"""
+
+import os
+
+import pytest
+
+import model_store
+
+
+def _mapped_ranges(path):
+    """Address ranges of /proc/self/maps entries backed by the given file"""
+    ranges = []
+    with open("/proc/self/maps") as f:
+        for line in f:
+            if line.rstrip().endswith(os.path.realpath(path)):
+                start, end = line.split()[0].split("-")
+                ranges.append((int(start, 16), int(end, 16)))
+    return ranges
+
+
+@pytest.fixture
+def tiny_gpt2(tmp_path):
+    transformers = pytest.importorskip("transformers")
+    config = transformers.GPT2Config(n_layer=2, n_embd=32, n_head=2, vocab_size=100, n_positions=64)
+    model = transformers.GPT2LMHeadModel(config).eval()
+    model.save_pretrained(tmp_path, safe_serialization=True)
+    return model, str(tmp_path)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc/self/maps")
+def test_mmap_load_points_into_snapshot(tiny_gpt2):
+    import torch
+
+    reference, path = tiny_gpt2
+    model = model_store._load_mmap_model(path)
+
+    ranges = _mapped_ranges(os.path.join(path, model_store.WEIGHTS_NAME))
+    assert ranges
+    for name, param in model.named_parameters():
+        ptr = param.untyped_storage().data_ptr()
+        assert any(start <= ptr < end for start, end in ranges), name
+
+    # Non-persistent buffers (GPT2 attention masks) exist and the outputs match a regular load
+    assert not any(buf.is_meta for buf in model.buffers())
+    inputs = torch.tensor([[1, 2, 3, 4]])
+    with torch.no_grad():
+        assert torch.allclose(model(inputs).logits, reference(inputs).logits, atol=1e-6)
+
+
+def test_missing_models_are_skipped_for_the_long_window(tmp_path, monkeypatch):
+    store = str(tmp_path)
+    assert not model_store.is_known_unavailable("some/model", store)
+    model_store.mark_unavailable(
+        "some/model", OSError("some/model is not a local folder and is not a valid model identifier"), store)
+    assert model_store.is_known_unavailable("some/model", store)
+
+    monkeypatch.setattr(model_store, "TRANSIENT_RETRY_AFTER", 0)
+    assert model_store.is_known_unavailable("some/model", store)
+
+
+def test_network_errors_are_retried_soon(tmp_path, monkeypatch):
+    store = str(tmp_path)
+    offline = OSError("We couldn't connect to 'https://huggingface.co' to load the files")
+    model_store.mark_unavailable("distilgpt2", offline, store)
+    model_store.mark_unavailable("gpt2", "429 Client Error: Too Many Requests", store)
+    assert model_store.is_known_unavailable("distilgpt2", store)
+
+    monkeypatch.setattr(model_store, "TRANSIENT_RETRY_AFTER", 0)
+    assert not model_store.is_known_unavailable("distilgpt2", store)
+    assert not model_store.is_known_unavailable("gpt2", store)
+
+
+def test_error_classification():
+    assert model_store.is_permanent_error(ValueError("x")) is False
+    assert model_store.is_permanent_error("does not appear to have a file named config.json")
+
+    # A not-found error caused by a failed connection is still a network problem
+    try:
+        try:
+            raise ConnectionError("Failed to resolve 'huggingface.co'")
+        except ConnectionError as e:
+            raise OSError("model not found in the cached files") from e
+    except OSError as e:
+        assert not model_store.is_permanent_error(e)
+
+
+def _update_many(store, worker, count):
+    for i in range(count):
+        model_store.update_manifest(f"worker{worker}/model{i}", store, size_bytes=i)
+
+
+@pytest.mark.skipif(model_store.fcntl is None, reason="needs fcntl")
+def test_concurrent_processes_do_not_lose_manifest_updates(tmp_path):
+    import multiprocessing
+
+    store = str(tmp_path)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_update_many, args=(store, w, 25)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+
+    assert len(model_store.load_manifest(store)) == 100
@@ -0,0 +1,59 @@
+"""
+Tests for opt-in request profiling
+"""
+
+import os
+import time
+
+import profiling
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_not_profiled_unless_asked(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0)
+    with profiling.maybe_profile("request") as profile:
+        assert profile is None
+
+
+def test_sampling_profile_writes_flamegraph_and_top(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_INTERVAL_MS", 1)
+    with profiling.maybe_profile("sampled request", force="sample") as profile:
+        _busy(0.2)
+
+    summary = profile.summary()
+    assert set(summary["paths"]) == {"folded", "top"}
+    assert all(os.path.isfile(path) for path in summary["paths"].values())
+    with open(summary["paths"]["folded"], encoding="utf-8") as f:
+        assert any("_busy (test_profiling.py" in line for line in f)
+    # Self and total time come from the sample counts, scaled to the measured wall time
+    assert summary["top"] and all(own <= total <= summary["seconds"] + 1e-6 for _, own, total in summary["top"])
+
+
+def test_cprofile_writes_prof_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    with profiling.maybe_profile("traced request", force="cprofile") as profile:
+        _busy(0.05)
+
+    assert os.path.isfile(profile.paths["prof"])
+    assert any(name.startswith("_busy") for name, _, _ in profile.top)
+
+
+def test_concurrent_cprofile_requests_fall_back_to_sampling(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    with profiling.maybe_profile("first", force="cprofile") as first:
+        with profiling.maybe_profile("second", force="cprofile") as second:
+            _busy(0.05)
+
+    assert first.mode == "cprofile" and "prof" in first.paths
+    assert second.mode == "sample" and "folded" in second.paths
+
+    # The profiler is free again afterwards
+    with profiling.maybe_profile("third", force="cprofile") as third:
+        _busy(0.01)
+    assert third.mode == "cprofile"
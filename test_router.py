@@ -0,0 +1,52 @@
+"""
+Tests for routing template-covered prompts past the model
+"""
+
+from router import TemplateRouter, score_description
+
+
+def test_plain_template_prompts_are_routed():
+    router = TemplateRouter(threshold=0.75)
+    assert router.route("simple calculator") == "calculator"
+    assert router.route("Create a to-do list app") == "todo"
+    assert router.route("contact form with name, email and message fields") == "contact"
+    assert router.stats()["routed"] == 3
+
+
+def test_prompts_asking_for_more_than_the_template_go_to_the_model():
+    router = TemplateRouter(threshold=0.75)
+    assert router.route("scientific calculator with graphing and unit conversion history") is None
+    assert router.route("todo list synced with google calendar and drag and drop priorities") is None
+    assert router.route("portfolio website with a blog") is None
+
+
+def test_prompts_mixing_templates_lose_confidence():
+    template_type, confidence = score_description("calculator with a todo list")
+    assert confidence < 0.75
+    assert score_description("") == (None, 0.0)
+
+
+def test_saved_time_estimate():
+    router = TemplateRouter(threshold=0.75)
+    router.record_model_time(2.0)
+    router.record_model_time(4.0)
+    router.route("calculator")
+    stats = router.stats()
+    assert stats["avg_model_seconds"] == 3.0
+    assert stats["estimated_seconds_saved"] == 3.0
+
+
+def test_themed_template_prompts_are_routed_to_a_variant():
+    router = TemplateRouter(threshold=0.75)
+    assert router.route("dark calculator") == "calculator"
+    assert router.route("ocean themed todo list") == "todo"
+    assert router.route("compact contact form") == "contact"
+    # Styling one part of the page is more than a catalog variant can do
+    assert router.route("calculator with red buttons") is None
+
+
+def test_dark_calculator_is_served_the_midnight_variant(generator):
+    html_code, backend, _ = generator._generate_html("dark calculator")
+    assert backend == "router"
+    assert html_code == generator._customize_template(generator.catalog.get("calculator", "midnight"), "dark calculator")
+    assert "#0f2027" in html_code
@@ -0,0 +1,72 @@
+"""
+Tests for speculative decoding with tiny random models in place of GPT2/DistilGPT2
+"""
+
+import copy
+
+import pytest
+
+import speculative
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+
+class CharTokenizer:
+    """One token per ASCII character, enough for SpeculativeGenerator's tokenize/decode calls"""
+
+    def __call__(self, text, return_tensors=None, truncation=True, max_length=None):
+        ids = [min(ord(c), 127) for c in text]
+        if truncation and max_length:
+            ids = ids[-max_length:]
+        return {"input_ids": torch.tensor([ids]), "attention_mask": torch.ones(1, len(ids), dtype=torch.long)}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(int(i)) for i in ids)
+
+
+def _tiny_gpt2(seed):
+    torch.manual_seed(seed)
+    # No EOS so generation always runs to the requested length; a wide init keeps the two models distinct
+    config = transformers.GPT2Config(n_layer=2, n_embd=32, n_head=2, vocab_size=128, n_positions=128,
+                                     bos_token_id=None, eos_token_id=None, initializer_range=0.5)
+    return transformers.GPT2LMHeadModel(config).eval()
+
+
+@pytest.fixture
+def make_generator(monkeypatch):
+    def make(target, draft):
+        models = {"target": target, "draft": draft}
+        monkeypatch.setattr(speculative, "_load_causal_lm", lambda name: (models[name], CharTokenizer()))
+        return speculative.SpeculativeGenerator("target", "draft", draft_tokens=4)
+    return make
+
+
+def test_identical_draft_is_always_accepted(make_generator):
+    target = _tiny_gpt2(0)
+    gen = make_generator(target, copy.deepcopy(target))
+    gen("<html>", max_new_tokens=30, do_sample=False, pad_token_id=0)
+
+    stats = gen.stats()
+    assert stats["acceptance_rate"] == 1.0
+    assert stats["new_tokens"] == 30
+
+
+def test_different_draft_is_partly_rejected(make_generator):
+    gen = make_generator(_tiny_gpt2(0), _tiny_gpt2(1))
+    gen("<html>", max_new_tokens=30, do_sample=False, pad_token_id=0)
+    assert gen.stats()["acceptance_rate"] < 1.0
+
+
+def test_output_matches_the_pipeline_format(make_generator):
+    target = _tiny_gpt2(0)
+    gen = make_generator(target, copy.deepcopy(target))
+
+    by_length = gen("<html>", max_length=40, do_sample=False, pad_token_id=0)
+    by_new_tokens = gen("<html>", max_new_tokens=34, do_sample=False, pad_token_id=0)
+
+    assert isinstance(by_length, list) and list(by_length[0]) == ["generated_text"]
+    assert by_length[0]["generated_text"].startswith("<html>")
+    assert len(by_length[0]["generated_text"]) == 40
+    assert by_new_tokens == by_length
+    assert gen.stats()["generations"] == 2
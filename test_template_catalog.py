@@ -0,0 +1,55 @@
+"""
+Tests for the pre-rendered template variant catalog
+"""
+
+import gc
+import weakref
+
+import pytest
+
+from template_catalog import TemplateCatalog, choose_variant, render_variant
+from validator import validate_html
+
+
+@pytest.mark.parametrize("description, variant", [
+    ("blue calculator", ("ocean", "default")),
+    ("dark mode todo app", ("midnight", "default")),
+    ("compact contact form", ("default", "compact")),
+    ("todo list with a red delete button", ("default", "default")),
+    ("calculator with big buttons in green", ("default", "default")),
+    ("big forest themed calculator with white text", ("forest", "wide")),
+])
+def test_choose_variant(description, variant):
+    assert choose_variant(description) == variant
+
+
+def test_catalog_serves_rendered_variants(templates, tmp_path):
+    catalog = TemplateCatalog(templates, str(tmp_path / "catalog.bin"))
+    assert catalog.get("todo", "sunset", "wide") == render_variant("todo", templates["todo"], "sunset", "wide")
+    assert catalog.get("todo", "default", "default") == templates["todo"]
+    assert catalog.get("todo", "no-such-theme") is None
+
+    for name in catalog.variants():
+        assert validate_html(catalog.get(*name.split("/"))).acceptable, name
+
+    # A second process reads the file written by the first
+    reopened = TemplateCatalog(templates, str(tmp_path / "catalog.bin"))
+    assert reopened.get("calculator", "ocean", "compact") == catalog.get("calculator", "ocean", "compact")
+
+
+def test_stale_or_corrupt_catalog_is_rebuilt(templates, tmp_path):
+    path = tmp_path / "catalog.bin"
+    TemplateCatalog({"todo": templates["todo"]}, str(path)).variants()
+    assert TemplateCatalog(templates, str(path)).get("calculator") == templates["calculator"]
+
+    path.write_bytes(b"garbage")
+    assert TemplateCatalog(templates, str(path)).get("contact") == templates["contact"]
+
+
+def test_catalogs_can_be_collected(templates, tmp_path):
+    catalog = TemplateCatalog(templates, str(tmp_path / "catalog.bin"))
+    catalog.get("todo", "ocean")
+    ref = weakref.ref(catalog)
+    del catalog
+    gc.collect()
+    assert ref() is None
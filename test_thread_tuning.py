@@ -0,0 +1,35 @@
+"""
+Tests for per-worker torch thread tuning
+"""
+
+import thread_tuning
+
+
+def test_candidates_stay_within_the_worker_share():
+    assert thread_tuning.candidate_threads(16, 1) == [1, 2, 4, 8, 16]
+    assert thread_tuning.candidate_threads(16, 3) == [1, 2, 4, 5]
+    assert thread_tuning.candidate_threads(2, 8) == [1]
+
+
+def test_calibration_prefers_fewer_threads_when_as_fast(monkeypatch):
+    measured = {1: 10.0, 2: 19.0, 4: 30.0, 8: 31.0}
+    monkeypatch.setattr(thread_tuning, "available_cores", lambda: 8)
+    monkeypatch.setattr(thread_tuning, "measure_tokens_per_sec", lambda gen, n, tokens: measured[n])
+
+    tuning = thread_tuning.calibrate(object(), workers=1)
+    assert tuning["threads"] == 4
+    assert tuning["measured"] == {"1": 10.0, "2": 19.0, "4": 30.0, "8": 31.0}
+
+
+def test_tune_uses_saved_calibration_then_heuristic(tmp_path, monkeypatch):
+    applied = []
+    monkeypatch.setattr(thread_tuning, "TUNING_FILE", str(tmp_path / "tuning.json"))
+    monkeypatch.setattr(thread_tuning, "available_cores", lambda: 8)
+    monkeypatch.setattr(thread_tuning, "apply_threads", applied.append)
+
+    assert thread_tuning.tune(object(), "distilgpt2", workers=4, mode="auto")["source"] == "heuristic"
+    thread_tuning.save_tuning(thread_tuning._tuning_key("distilgpt2", 8, 4), {"threads": 1, "tokens_per_sec": 25.0})
+    tuning = thread_tuning.tune(object(), "distilgpt2", workers=4, mode="auto")
+
+    assert tuning["source"] == "saved" and applied == [2, 1]
+    assert thread_tuning.tune(object(), "distilgpt2", mode="off") is None
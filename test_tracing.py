@@ -0,0 +1,48 @@
+"""
+Tests for trace recording and replay
+"""
+
+import json
+
+import tracing
+
+
+def test_recorder_writes_one_line_per_request(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    recorder = tracing.TraceRecorder(str(path), flush_interval=0.01)
+    recorder.record("simple calculator", "template", 0.02, 0.0, "<html></html>")
+    recorder.record("weather dashboard", "openai", 1.5, 1.4, None)
+    recorder.close()
+
+    records = tracing.load_trace(str(path))
+    assert [r["backend"] for r in records] == ["template", "openai"]
+    assert records[0]["output_size"] == len("<html></html>")
+    assert records[1]["output_size"] == 0
+    assert "html" not in records[0]
+
+
+def test_percentile_and_summary():
+    values = [0.1 * i for i in range(1, 101)]
+    assert tracing.percentile([], 50) is None
+    assert abs(tracing.percentile(values, 50) - 5.0) < 1e-9
+    assert abs(tracing.percentile(values, 99) - 9.9) < 1e-9
+    assert tracing.percentile([1, 2, 3, 4], 50) == 2
+    assert tracing.percentile([1, 2, 3, 4], 100) == 4
+
+    summary = tracing.summarize([1.0, 2.0, 3.0], wall_seconds=2.0)
+    assert summary["requests"] == 3 and summary["mean"] == 2.0 and summary["throughput"] == 1.5
+
+
+def test_replay_against_stubbed_backends(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    lines = [
+        {"ts": 100.0, "description": "simple calculator", "backend": "router", "duration": 0.01,
+         "backend_seconds": 0.0, "output_size": 5000, "output_sha256": ""},
+        {"ts": 100.05, "description": "weather dashboard with charts", "backend": "model", "duration": 0.05,
+         "backend_seconds": 0.05, "output_size": 3000, "output_sha256": ""},
+    ]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines), encoding="utf-8")
+
+    report = tracing.replay(str(path), speed=10)
+    assert report["replayed"]["requests"] == 2
+    assert report["backend_changes"] == 0
@@ -0,0 +1,89 @@
+"""
+Tests for the structural HTML validator
+"""
+
+import time
+
+from validator import StructureValidator, validate_html
+
+SHORT_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Hello</title></head>
+<body><h1>Hello</h1><p>Short but complete</body>
+</html>"""
+
+
+def test_truncated_model_output_is_rejected(generator):
+    # What the simple model path sees when generation stops mid-heading
+    generated = """Create HTML app: calculator
+
+HTML:
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>Calculator</title>
+<style>
+body { font-family: Arial, sans-serif; }
+</style>
+</head>
+<body>
+<div class="container">
+<h1>Calculator with buttons for"""
+    result = validate_html(generator.clean_generated_html(generated))
+    assert result.problems['truncated'] == 1
+    assert not result.acceptable
+
+
+def test_missing_closing_html_is_rejected():
+    result = validate_html(SHORT_PAGE.replace("</body>\n</html>", ""))
+    assert result.problems['truncated'] == 1
+    assert not result.acceptable
+
+
+def test_short_valid_page_is_accepted():
+    result = validate_html(SHORT_PAGE)
+    assert result.acceptable and result.score == 1.0
+
+
+def test_long_broken_page_is_rejected():
+    body = "".join(f"<div class='row'><span>{i}</div></section>" for i in range(500))
+    result = validate_html(f"<!DOCTYPE html><html><head><title>x</title></head><body>{body}</body></html>")
+    assert result.problems['unclosed_element'] and result.problems['stray_end_tag']
+    assert not result.acceptable
+
+
+def test_unclosed_script_is_rejected():
+    result = validate_html(SHORT_PAGE.replace("<h1>", "<script>let x = 1;<h1>"))
+    assert result.problems['unclosed_raw_text'] == 1
+    assert not result.acceptable
+
+
+def test_templates_pass(generator):
+    for template_type, template in generator.templates.items():
+        assert validate_html(template).score == 1.0, template_type
+
+
+def test_incremental_feed_matches_one_pass():
+    validator = StructureValidator()
+    for i in range(0, len(SHORT_PAGE), 7):
+        validator.feed(SHORT_PAGE[i:i + 7])
+        assert not validator.result(final=False).problems
+    assert validator.result().score == validate_html(SHORT_PAGE).score
+
+
+def test_streaming_a_long_script_is_linear():
+    script = "".join(f"  if (a < {i}) {{ el.innerHTML = '<div>' + {i} + '</div>'; }}\n" for i in range(40000))
+    page = SHORT_PAGE.replace("</body>", f"<script>\n{script}</SCRIPT></body>")
+
+    validator = StructureValidator()
+    started = time.perf_counter()
+    for i in range(0, len(page), 4):
+        validator.feed(page[i:i + 4])
+        if i == len(page) // 2:
+            # Mid-script the page is incomplete but nothing is wrong yet
+            assert not validator.result(final=False).problems
+            assert validator.result().problems['unclosed_raw_text'] == 1
+    # About 0.8s; re-scanning the script buffer on every chunk took over a minute
+    assert time.perf_counter() - started < 10
+    assert validator.result().score == validate_html(page).score == 1.0
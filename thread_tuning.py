@@ -0,0 +1,158 @@
+"""
+Per-worker torch thread tuning so co-located app processes do not oversubscribe the CPU
+"""
+
+import json
+import os
+import time
+
+import model_store
+
+# Number of app processes sharing this host's cores
+APP_WORKERS = int(os.getenv("APP_WORKERS", "1"))
+
+# "auto": saved calibration or cores/workers heuristic, "calibrate": benchmark at startup, "off": torch defaults
+THREAD_TUNING = os.getenv("THREAD_TUNING", "auto")
+
+TUNING_FILE = os.getenv("THREAD_TUNING_FILE", os.path.join(model_store.STORE_DIR, "thread_tuning.json"))
+
+# Thread counts within this fraction of the best throughput count as equally fast; fewer threads win
+TOLERANCE = 0.05
+
+_BENCH_PROMPT = "<!DOCTYPE html>\n<html>\n<head>\n<title>Calculator</title>\n<style>\n"
+
+
+def available_cores():
+    """Cores this process may run on (respects taskset/cgroup affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def candidate_threads(cores, workers):
+    """Thread counts worth trying: powers of two up to this worker's share of the cores"""
+    share = max(1, cores // max(1, workers))
+    candidates = {share}
+    n = 1
+    while n < share:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+
+def _tuning_key(model_id, cores, workers):
+    return f"{model_id}|{cores}cores|{workers}workers"
+
+
+def load_tunings():
+    try:
+        with open(TUNING_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_tuning(key, tuning):
+    tunings = load_tunings()
+    tunings[key] = tuning
+    os.makedirs(os.path.dirname(TUNING_FILE) or ".", exist_ok=True)
+    tmp_path = f"{TUNING_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(tunings, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, TUNING_FILE)
+
+
+def apply_threads(threads):
+    """Set torch intra-op threads, and inter-op threads if torch still allows it"""
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        # Generation is one sequential op chain; extra inter-op threads only add contention
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel region has run
+        pass
+
+
+def measure_tokens_per_sec(generator, threads, new_tokens=32):
+    """Greedy decoding throughput of a pipeline (or pipeline-like) at a thread count"""
+    import torch
+
+    apply_threads(threads)
+    inputs = generator.tokenizer(_BENCH_PROMPT, return_tensors="pt")
+    with torch.no_grad():
+        # Warm-up so allocator and thread pool start-up are not measured
+        generator.model.generate(**inputs, max_new_tokens=4, do_sample=False, pad_token_id=50256)
+        started = time.perf_counter()
+        output = generator.model.generate(**inputs, max_new_tokens=new_tokens, min_new_tokens=new_tokens,
+                                          do_sample=False, pad_token_id=50256)
+    generated = output.shape[1] - inputs["input_ids"].shape[1]
+    return generated / (time.perf_counter() - started)
+
+
+def calibrate(generator, workers=APP_WORKERS, new_tokens=32):
+    """Benchmark the candidate thread counts and return the chosen tuning"""
+    cores = available_cores()
+    results = {n: measure_tokens_per_sec(generator, n, new_tokens) for n in candidate_threads(cores, workers)}
+
+    best = max(results.values())
+    threads = min(n for n, tps in results.items() if tps >= best * (1 - TOLERANCE))
+    return {
+        "threads": threads,
+        "tokens_per_sec": round(results[threads], 1),
+        "measured": {str(n): round(tps, 1) for n, tps in results.items()},
+        "source": "calibrated",
+        "calibrated_at": time.time(),
+    }
+
+
+def tune(generator, model_id, workers=APP_WORKERS, mode=THREAD_TUNING):
+    """Pick, apply and return the thread setting for a freshly loaded model (None when off)"""
+    if mode == "off" or generator is None:
+        return None
+
+    cores = available_cores()
+    key = _tuning_key(model_id, cores, workers)
+    tuning = load_tunings().get(key)
+
+    if tuning is None and mode == "calibrate":
+        tuning = calibrate(generator, workers)
+        try:
+            save_tuning(key, tuning)
+        except OSError:
+            pass
+    elif tuning is None:
+        tuning = {"threads": max(1, cores // max(1, workers)), "tokens_per_sec": None, "source": "heuristic"}
+    else:
+        tuning = dict(tuning, source="saved")
+
+    apply_threads(tuning["threads"])
+    tuning["cores"] = cores
+    tuning["workers"] = workers
+    return tuning
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibrate torch threads per app worker")
+    parser.add_argument("model", nargs="?", default="distilgpt2", help="hub model name")
+    parser.add_argument("--workers", type=int, default=APP_WORKERS, help="app processes sharing this host")
+    parser.add_argument("--tokens", type=int, default=32, help="tokens generated per measurement")
+    args = parser.parse_args()
+
+    pipe = model_store.load_pipeline(args.model)
+    if pipe is None:
+        from transformers import pipeline
+        pipe = pipeline("text-generation", model=args.model, device=-1)
+
+    result = calibrate(pipe, args.workers, args.tokens)
+    # Keyed by the model id the app uses, which for these models is the hub name without the org
+    model_id = {"microsoft/DialoGPT-small": "dialogpt-small"}.get(args.model, args.model)
+    save_tuning(_tuning_key(model_id, available_cores(), args.workers), result)
+
+    for threads, tps in result["measured"].items():
+        print(f"{threads:>3} threads: {tps:>7.1f} tokens/sec")
+    print(f"✅ {result['threads']} threads per worker ({result['tokens_per_sec']} tokens/sec) saved to {TUNING_FILE}")
@@ -0,0 +1,226 @@
+"""
+Request trace recording (JSONL) and offline replay against stubbed backends
+"""
+
+import atexit
+import hashlib
+import json
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# JSONL file receiving one line per generation request (unset disables tracing)
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+_STOP = object()
+
+
+class TraceRecorder:
+    """Hands records to a background writer so generate_html only pays for a queue put"""
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, description, backend, duration, backend_seconds, html):
+        self._queue.put((time.time(), description, backend, duration, backend_seconds, html))
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout=5)
+
+    def _write_loop(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                stop = item is _STOP
+                lines = [] if stop else [self._to_line(item)]
+
+                # Drain whatever else is queued so bursts become a single write
+                while not stop:
+                    try:
+                        item = self._queue.get(timeout=self.flush_interval if not lines else 0)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                    else:
+                        lines.append(self._to_line(item))
+
+                if lines:
+                    f.write("".join(lines))
+                    f.flush()
+                    self.recorded += len(lines)
+                if stop:
+                    return
+
+    @staticmethod
+    def _to_line(item):
+        ts, description, backend, duration, backend_seconds, html = item
+        data = (html or "").encode("utf-8")
+        return json.dumps({
+            "ts": round(ts, 6),
+            "description": description,
+            "backend": backend,
+            "duration": round(duration, 6),
+            "backend_seconds": round(backend_seconds, 6),
+            "output_size": len(data),
+            "output_sha256": hashlib.sha256(data).hexdigest(),
+        }, ensure_ascii=False) + "\n"
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Process-wide recorder for TRACE_FILE, or None when tracing is disabled"""
+    global _recorder
+    if not TRACE_FILE:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TraceRecorder(TRACE_FILE)
+        return _recorder
+
+
+def load_trace(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile (p in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, wall_seconds):
+    """Latency percentiles and throughput of a set of requests"""
+    return {
+        "requests": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "throughput": len(latencies) / wall_seconds if wall_seconds > 0 else None,
+    }
+
+
+def _stub_html(size):
+    """Valid page of roughly the recorded size"""
+    head = "<!DOCTYPE html>\n<html>\n<head>\n<title>Replay</title>\n</head>\n<body>\n<p>"
+    tail = "</p>\n</body>\n</html>"
+    return head + "x" * max(0, size - len(head) - len(tail)) + tail
+
+
+def _stubbed_generator():
+    """HTMLGenerator whose OpenAI and model backends sleep for the recorded backend time"""
+    from generator import HTMLGenerator
+
+    current = threading.local()
+    gen = HTMLGenerator(load_models=False)
+    gen.trace_recorder = None
+
+    def fake_backend(backend):
+        def generate(description):
+            record = current.record
+            if record["backend"] != backend:
+                return None
+            time.sleep(record.get("backend_seconds", 0.0))
+            return _stub_html(record["output_size"])
+        return generate
+
+    gen._generate_with_openai = fake_backend("openai")
+    gen._generate_with_simple_model = fake_backend("model")
+    gen.use_openai = True
+    gen.generator = fake_backend("model")  # truthy, so the model tier is tried
+    return gen, current
+
+
+def replay(trace_path, speed=1.0, concurrency=32, generator=None):
+    """Replay a trace at its original arrival rate times speed; returns a comparison report.
+
+    By default the OpenAI and model backends are stubbed to take the time they
+    took when recorded, so differences come from the code under test.
+    """
+    records = load_trace(trace_path)
+    if not records:
+        raise ValueError(f"{trace_path} contains no requests")
+
+    if generator is None:
+        gen, current = _stubbed_generator()
+    else:
+        gen, current = generator, threading.local()
+
+    lock = threading.Lock()
+    latencies = []
+    backend_changes = 0
+
+    def run(record):
+        nonlocal backend_changes
+        current.record = record
+        started = time.perf_counter()
+        _, backend, _ = gen._generate_html(record["description"])
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if backend != record["backend"]:
+                backend_changes += 1
+
+    first_ts = records[0]["ts"]
+    replay_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            # Keep the original spacing between arrivals, compressed by the speed factor
+            delay = (record["ts"] - first_ts) / speed - (time.perf_counter() - replay_start)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, record)
+    replay_wall = time.perf_counter() - replay_start
+
+    recorded_wall = (records[-1]["ts"] + records[-1]["duration"] - first_ts) / speed
+    return {
+        "recorded": summarize([r["duration"] for r in records], recorded_wall),
+        "replayed": summarize(latencies, replay_wall),
+        "backend_changes": backend_changes,
+        "speed": speed,
+    }
+
+
+def _format_report(report):
+    lines = [f"{'':<10}{'requests':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}{'req/s':>9}"]
+    for name in ("recorded", "replayed"):
+        s = report[name]
+        lines.append(f"{name:<10}{s['requests']:>9}" + "".join(
+            f"{s[k]:>9.3f}" if s[k] is not None else f"{'-':>9}" for k in ("p50", "p95", "p99", "mean", "throughput")))
+    rec, rep = report["recorded"], report["replayed"]
+    lines.append(f"p95 change: {(rep['p95'] - rec['p95']) * 1000:+.1f} ms · "
+                 f"requests routed to a different backend: {report['backend_changes']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay a recorded generation trace")
+    parser.add_argument("trace", help="JSONL trace written with TRACE_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="arrival rate multiplier (10 = ten times faster)")
+    parser.add_argument("--concurrency", type=int, default=32, help="maximum requests in flight")
+    args = parser.parse_args()
+
+    print(_format_report(replay(args.trace, speed=args.speed, concurrency=args.concurrency)))
@@ -0,0 +1,193 @@
+"""
+One-pass structural HTML validator used to accept or reject generated pages
+"""
+
+import os
+from collections import Counter
+from html.parser import HTMLParser
+
+# Pages scoring below this are replaced by the template fallback
+MIN_SCORE = float(os.getenv("VALIDATOR_MIN_SCORE", "0.7"))
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+}
+
+# Elements whose end tag may legally be left out
+OPTIONAL_END = {
+    'html', 'head', 'body', 'p', 'li', 'dt', 'dd', 'tr', 'td', 'th', 'thead', 'tbody',
+    'tfoot', 'option', 'optgroup', 'colgroup', 'caption', 'rt', 'rp',
+}
+
+# Each problem costs this much of the score, capped per category
+_PENALTIES = {
+    'missing_doctype': (0.1, 0.1),
+    'missing_html': (0.1, 0.1),
+    'missing_head': (0.15, 0.15),
+    'missing_body': (0.2, 0.2),
+    'missing_title': (0.05, 0.05),
+    'empty_body': (0.2, 0.2),
+    'unclosed_raw_text': (0.3, 0.3),
+    'truncated': (0.35, 0.35),
+    'stray_end_tag': (0.05, 0.3),
+    'unclosed_element': (0.05, 0.3),
+}
+
+
+class ValidationResult:
+    def __init__(self, problems, complete):
+        self.problems = problems
+        self.complete = complete
+        score = 1.0
+        for kind, count in problems.items():
+            each, cap = _PENALTIES[kind]
+            score -= min(cap, each * count)
+        self.score = round(max(0.0, score), 3)
+
+    @property
+    def acceptable(self):
+        return self.score >= MIN_SCORE
+
+    def __repr__(self):
+        return f"ValidationResult(score={self.score}, problems={dict(self.problems)})"
+
+
+class StructureValidator(HTMLParser):
+    """Incremental validator: feed() chunks as they are generated, result() at any point.
+
+    Work per tag is O(1) amortized (open tags are counted, so closing an
+    element never scans the stack), so validation is linear in the input.
+    Inside <script>/<style> html.parser searches its whole raw-text buffer for
+    the close tag on every feed(), so chunks are held back until one could
+    contain it; otherwise streaming a long script would be quadratic.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self._held = []
+        self._held_tail = ''
+        self.problems = Counter()
+        self.stack = []
+        self.open_counts = Counter()
+        self.seen = set()
+        self.closed = set()
+        self.has_doctype = False
+        self.body_content = False
+
+    def feed(self, data):
+        cdata_elem = getattr(self, 'cdata_elem', None)
+        if cdata_elem:
+            marker = '</' + cdata_elem
+            # The tail of earlier chunks catches a close tag split across chunk boundaries
+            window = (self._held_tail + data).lower()
+            self._held.append(data)
+            if marker not in window:
+                self._held_tail = window[-(len(marker) - 1):]
+                return
+            data = ''.join(self._held)
+            self._held = []
+            self._held_tail = ''
+        super().feed(data)
+
+    def handle_decl(self, decl):
+        if decl.lower().startswith('doctype'):
+            self.has_doctype = True
+
+    def handle_starttag(self, tag, attrs):
+        self.seen.add(tag)
+        if self.open_counts['body'] and tag not in ('script', 'style'):
+            self.body_content = True
+        if tag in VOID_ELEMENTS:
+            return
+        self.stack.append(tag)
+        self.open_counts[tag] += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.seen.add(tag)
+        if self.open_counts['body']:
+            self.body_content = True
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        if not self.open_counts[tag]:
+            self.problems['stray_end_tag'] += 1
+            return
+        self.closed.add(tag)
+        # Implicitly close everything opened inside the element being closed
+        while self.stack:
+            open_tag = self.stack.pop()
+            self.open_counts[open_tag] -= 1
+            if open_tag == tag:
+                break
+            if open_tag not in OPTIONAL_END:
+                self.problems['unclosed_element'] += 1
+
+    def handle_data(self, data):
+        if self.open_counts['body'] and not self.body_content and data.strip():
+            self.body_content = True
+
+    def result(self, final=True):
+        """Score the input so far; final=False skips checks that need the whole document"""
+        problems = Counter(self.problems)
+        if final:
+            if not self.has_doctype:
+                problems['missing_doctype'] += 1
+            for tag in ('html', 'head', 'body', 'title'):
+                if tag not in self.seen:
+                    problems[f'missing_{tag}'] += 1
+            if 'body' in self.seen and not self.body_content:
+                problems['empty_body'] += 1
+            # The parser is still waiting for </script> or </style>
+            if getattr(self, 'cdata_elem', None):
+                problems['unclosed_raw_text'] += 1
+            unclosed = sum(1 for tag in self.stack if tag not in OPTIONAL_END)
+            if unclosed:
+                problems['unclosed_element'] += unclosed
+            # </body> and </html> are optional in HTML, but generated pages that stop without them
+            # (or inside an element) were cut off mid-generation
+            if unclosed or any(tag in self.seen and tag not in self.closed for tag in ('html', 'body')):
+                problems['truncated'] += 1
+        return ValidationResult(problems, complete=final)
+
+
+def validate_html(html):
+    """Validate a complete document in one pass"""
+    validator = StructureValidator()
+    validator.feed(html)
+    return validator.result(final=True)
+
+
+def _benchmark(target_mb):
+    import re
+    import time
+
+    # Markup of the real templates, repeated inside one body
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generator.py'), encoding='utf-8') as f:
+        templates = re.findall(r"'''(<!DOCTYPE.*?)'''", f.read(), re.DOTALL)
+    chunk = ''.join(re.search(r'<body>(.*?)</body>', t, re.DOTALL).group(1) for t in templates)
+
+    print(f"{'size':>10} {'seconds':>9} {'MB/s':>8}  score")
+    for scale in (0.25, 0.5, 1.0):
+        repeats = max(1, int(target_mb * scale * 1024 * 1024 / len(chunk)))
+        doc = ('<!DOCTYPE html><html><head><title>Bench</title></head><body>'
+               + chunk * repeats + '</body></html>')
+        started = time.perf_counter()
+        result = validate_html(doc)
+        elapsed = time.perf_counter() - started
+        size_mb = len(doc) / (1024 * 1024)
+        print(f"{size_mb:>8.1f}MB {elapsed:>9.3f} {size_mb / elapsed:>8.1f}  {result.score}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python validator.py page.html | python validator.py --bench [MB]
+    if len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        _benchmark(float(sys.argv[2]) if len(sys.argv) > 2 else 16)
+    elif len(sys.argv) > 1:
+        with open(sys.argv[1], encoding='utf-8') as f:
+            print(validate_html(f.read()))
+    else:
+        print("Usage: python validator.py <file.html> | --bench [MB]")